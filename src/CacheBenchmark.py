@@ -0,0 +1,146 @@
+"""
+Cache Emulator Benchmark
+Class: Computer Architecture
+
+Measures the emulator itself: accesses/second, startup time (CPU/Cache/RAM
+construction), peak RSS and per-phase time for each configuration. Every run
+gets a fresh process so peak RSS is per configuration. Results go to JSON so
+versions can be compared with --compare.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+from time import strftime
+
+import CacheEmulator
+
+# cache_size, block_size, associativity, replacement
+CONFIGURATIONS = [
+	(1024, 64, 2, "LRU"),
+	(1024, 8, 1, "LRU"),
+	(2048, 64, 8, "random"),
+	(65536, 64, 2, "LRU"),
+]
+
+parser = argparse.ArgumentParser(description='Cache Emulator Benchmark')
+parser.add_argument("-a","--algorithm",help = "The algorithms to benchmark", default = ['dot', 'mxm', 'mxm_block'], nargs = "+", choices=['dot', 'mxm', 'mxm_block'])
+parser.add_argument("-e","--engine",help = "The engines to benchmark", default = ['python', 'fast'], nargs = "+", choices=['python', 'fast'])
+parser.add_argument("-o","--output",help = "JSON file to write results to", default = "bench_results.json")
+parser.add_argument("--label",help = "Version label stored with the results (default: git commit)", default = None)
+parser.add_argument("--compare",help = "Earlier results JSON to compare against", default = None)
+
+
+def run_one(run_args):
+	#Runs in its own process: one configuration, one engine
+	with contextlib.redirect_stdout(io.StringIO()):
+		log = CacheEmulator.main(run_args)
+
+	accesses = log.read_hits + log.read_misses + log.write_hits + log.write_misses
+	phases = CacheEmulator.timer.phases
+
+	# ru_maxrss is KB on Linux, bytes on macOS
+	peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == "darwin":
+		peak_rss = peak_rss // 1024
+
+	return {
+		"algorithm": run_args.algorithm,
+		"engine": run_args.engine,
+		"cache_size": run_args.cache_size,
+		"block_size": run_args.block_size,
+		"associativity": run_args.associativity,
+		"replacement": run_args.replacement,
+		"instruction_cnt": log.instruction_cnt,
+		"read_hits": log.read_hits,
+		"read_misses": log.read_misses,
+		"write_hits": log.write_hits,
+		"write_misses": log.write_misses,
+		"accesses": accesses,
+		"accesses_per_second": accesses / phases["simulate"] if phases.get("simulate") else None,
+		"startup_time": phases.get("startup", 0.0),
+		"phases": phases,
+		"peak_rss_kb": peak_rss,
+	}
+
+
+def run_isolated(run_args):
+	#Fresh interpreter per run so peak RSS and startup are not polluted by earlier runs
+	with multiprocessing.get_context("spawn").Pool(1) as pool:
+		return pool.apply(run_one, (run_args,))
+
+
+def git_label():
+	try:
+		return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return "unknown"
+
+
+def key_of(result):
+	return (result["algorithm"], result["engine"], result["cache_size"], result["block_size"], result["associativity"], result["replacement"])
+
+
+def compare(old, new):
+	#Print throughput ratio and counter drift against an earlier run
+	old_results = {key_of(result): result for result in old["results"]}
+
+	print("Compared against {} ({})".format(old["label"], old["timestamp"]))
+	for result in new["results"]:
+		previous = old_results.get(key_of(result))
+		if previous == None:
+			continue
+
+		#No throughput when the simulate phase was not recorded or took no measurable time
+		if result["accesses_per_second"] == None or not previous["accesses_per_second"]:
+			speedup = "n/a"
+		else:
+			speedup = "{:.2f}x".format(result["accesses_per_second"] / previous["accesses_per_second"])
+		counters_match = all(result[name] == previous[name] for name in ["instruction_cnt", "read_hits", "read_misses", "write_hits", "write_misses"])
+		print("{}\tspeedup:{}\trss:{:+d}KB\tcounters:{}".format(
+			"\t".join(str(x) for x in key_of(result)), speedup, result["peak_rss_kb"] - previous["peak_rss_kb"], "same" if counters_match else "CHANGED"))
+
+
+def benchmark(bench_args):
+	results = []
+	for algorithm in bench_args.algorithm:
+		for cache_size, block_size, associativity, replacement in CONFIGURATIONS:
+			for engine in bench_args.engine:
+				run_args = CacheEmulator.parser.parse_args(["-c={}".format(cache_size), "-b={}".format(block_size), "-n={}".format(associativity),
+					"-r={}".format(replacement), "-a={}".format(algorithm), "-e={}".format(engine)])
+				result = run_isolated(run_args)
+				results.append(result)
+
+				print("{}\t{}\tc={} b={} n={} r={}\t{} acc/s\tstartup:{:.3f}s\trss:{}KB".format(
+					algorithm, engine, cache_size, block_size, associativity, replacement,
+					"n/a" if result["accesses_per_second"] == None else "{:.0f}".format(result["accesses_per_second"]),
+					result["startup_time"], result["peak_rss_kb"]))
+
+	return {
+		"label": bench_args.label if bench_args.label != None else git_label(),
+		"timestamp": strftime("%Y-%m-%dT%H:%M:%S"),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"results": results,
+	}
+
+
+if __name__ == "__main__":
+
+	bench_args = parser.parse_args()
+
+	report = benchmark(bench_args)
+
+	with open(bench_args.output, "w") as f:
+		json.dump(report, f, indent = 1)
+	print("Results written to {}".format(bench_args.output))
+
+	if bench_args.compare != None:
+		with open(bench_args.compare) as f:
+			compare(json.load(f), report)
@@ -0,0 +1,252 @@
+"""
+Cache Checkpoints
+Class: Computer Architecture
+
+Snapshot / restore of cache state (tags, valid bits, recency, dirty bits,
+logical clock, RNG state, per-sector valid bits of sectored lines), TLB
+contents when virtual memory is on, way owners and utility monitors of a
+partitioned cache, and optionally RAM contents, as one compressed .npz.
+The reference Cache and FastCache share the format, so a state warmed up on
+the fast engine can be branched on either engine.
+"""
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+COUNTERS = ["instruction_cnt", "read_hits", "read_misses", "write_hits", "write_misses"]
+
+
+def is_reference(cache):
+	#Reference Cache keeps DataBlock objects; FastCache keeps only arrays
+	return hasattr(cache, "blocks")
+
+
+def cache_arrays(cache):
+	if not is_reference(cache):
+		return cache.tags, cache.valid, cache.last_visited, cache.last_loaded, cache.dirty
+
+	valid = np.array(cache.valid, dtype=np.bool_)
+	tags = np.array(cache.tags, dtype=np.int64)
+	last_visited = np.zeros(tags.shape, dtype=np.int64)
+	last_loaded = np.zeros(tags.shape, dtype=np.int64)
+	dirty = np.zeros(tags.shape, dtype=np.bool_)
+	for set_index in range(cache.num_of_sets):
+		for block_idx in range(cache.blocks_per_set):
+			if valid[set_index, block_idx]:
+				block = cache.blocks[set_index][block_idx]
+				last_visited[set_index, block_idx] = block.last_visited_time
+				last_loaded[set_index, block_idx] = block.last_loaded_time
+				dirty[set_index, block_idx] = block.dirty
+	return tags, valid, last_visited, last_loaded, dirty
+
+
+def sectors_per_block(cache):
+	#FastCache has no sectors
+	return cache.conf.sectors_per_block if is_reference(cache) else 1
+
+
+def rng_arrays(prefix, rng_state):
+	#np.random.get_state() tuple -> arrays named prefix_keys, prefix_pos, prefix_gauss
+	return {
+		prefix + "_keys": rng_state[1],
+		prefix + "_pos": rng_state[2],
+		prefix + "_gauss": np.array([rng_state[3], rng_state[4]], dtype=np.float64),
+	}
+
+
+def rng_state(state, prefix):
+	return ("MT19937", state[prefix + "_keys"], int(state[prefix + "_pos"]), int(state[prefix + "_gauss"][0]), float(state[prefix + "_gauss"][1]))
+
+
+def tlb_arrays(mmu):
+	state = {"page_size": mmu.page_size, "tlb_levels": len(mmu.tlbs)}
+	for level, tlb in enumerate(mmu.tlbs):
+		prefix = "tlb{}".format(level + 1)
+		state[prefix + "_pages"] = np.array([[-1 if page == None else page for page in ways] for ways in tlb.pages], dtype=np.int64)
+		state[prefix + "_last_visited"] = np.array(tlb.last_visited, dtype=np.int64)
+		state[prefix + "_last_loaded"] = np.array(tlb.last_loaded, dtype=np.int64)
+		state[prefix + "_clock"] = tlb.clock
+		state.update(rng_arrays(prefix + "_rng", tlb.random.get_state()))
+	return state
+
+
+def restore_tlbs(state, mmu):
+	if "tlb_levels" not in state.files:
+		raise Exception("Checkpoint has no TLB state; save it from a run with the same --page-size and --tlb")
+	if int(state["page_size"]) != mmu.page_size or int(state["tlb_levels"]) != len(mmu.tlbs):
+		raise Exception("Checkpoint TLBs ({} byte pages, {} levels) do not match ({} byte pages, {} levels)".format(
+			int(state["page_size"]), int(state["tlb_levels"]), mmu.page_size, len(mmu.tlbs)))
+
+	for level, tlb in enumerate(mmu.tlbs):
+		prefix = "tlb{}".format(level + 1)
+		pages = state[prefix + "_pages"]
+		if pages.shape != (tlb.num_of_sets, tlb.blocks_per_set):
+			raise Exception("Checkpoint TLB level {} has {} sets x {} ways, TLB has {} x {}".format(
+				level + 1, pages.shape[0], pages.shape[1], tlb.num_of_sets, tlb.blocks_per_set))
+		tlb.pages = [[None if page < 0 else page for page in ways] for ways in pages.tolist()]
+		tlb.last_visited = state[prefix + "_last_visited"].tolist()
+		tlb.last_loaded = state[prefix + "_last_loaded"].tolist()
+		tlb.clock = int(state[prefix + "_clock"])
+		tlb.random.set_state(rng_state(state, prefix + "_rng"))
+
+
+def partition_arrays(partition):
+	state = {
+		"tenant_masks": np.array(partition.masks, dtype=np.int64),
+		"tenant_owner": np.array([[-1 if owner == None else owner for owner in ways] for ways in partition.owner], dtype=np.int64),
+		"tenant_accesses": partition.accesses,
+	}
+	if partition.umons != None:
+		stacks = np.full((partition.tenants, partition.num_of_sets, partition.blocks_per_set), -1, dtype=np.int64)
+		for tenant, umon in enumerate(partition.umons):
+			for set_index, stack in umon.stacks.items():
+				stacks[tenant, set_index, :len(stack)] = stack
+		state["umon_stacks"] = stacks
+		state["umon_hits"] = np.array([umon.hits for umon in partition.umons], dtype=np.int64)
+	return state
+
+
+def restore_partition(state, partition):
+	if "tenant_owner" not in state.files:
+		raise Exception("Checkpoint has no way owners; save it from a run with the same tenants")
+	if len(state["tenant_masks"]) != partition.tenants:
+		raise Exception("Checkpoint has {} tenants, cache has {}".format(len(state["tenant_masks"]), partition.tenants))
+
+	partition.owner = [[None if owner < 0 else owner for owner in ways] for ways in state["tenant_owner"].tolist()]
+	partition.accesses = int(state["tenant_accesses"])
+
+	if partition.umons != None:
+		if "umon_stacks" not in state.files:
+			raise Exception("Checkpoint has no utility monitors; save it from a run with --partitioner ucp")
+		#Utility-based masks are state, not configuration, so they come back too
+		partition.set_masks(state["tenant_masks"].tolist())
+		hits = state["umon_hits"].tolist()
+		for tenant, stacks in enumerate(state["umon_stacks"].tolist()):
+			umon = partition.umons[tenant]
+			umon.hits = hits[tenant]
+			umon.stacks = {set_index: [block for block in stack if block >= 0] for set_index, stack in enumerate(stacks) if stack[0] >= 0}
+
+
+def save(path, cache, ram = False, log = None, mmu = None):
+	#Write cache state to path; ram=True also stores RAM data (reference engine only), mmu its TLBs
+	tags, valid, last_visited, last_loaded, dirty = cache_arrays(cache)
+	rng = np.random.get_state()
+
+	state = {
+		"checkpoint_version": CHECKPOINT_VERSION,
+		"geometry": np.array([cache.conf.block_size, cache.num_of_sets, cache.blocks_per_set], dtype=np.int64),
+		"replacement": np.array(cache.conf.replacement),
+		"tags": tags,
+		"valid": valid,
+		"last_visited": last_visited,
+		"last_loaded": last_loaded,
+		"dirty": dirty,
+		"clock": cache.clock,
+		#Random victims already drawn from the RNG but not used yet (FastCache draws ahead), used first after restore
+		"pending_random": np.array(cache.pending_random[cache.pending_pos:], dtype=np.int64) if is_reference(cache) else cache.rand_ways[cache.rand_pos:],
+	}
+
+	state.update(rng_arrays("rng", rng))
+
+	if mmu != None:
+		state.update(tlb_arrays(mmu))
+
+	if getattr(cache, "partition", None) != None:
+		state.update(partition_arrays(cache.partition))
+
+	sectors = sectors_per_block(cache)
+	if sectors > 1:
+		state["sector_valid"] = np.array([[list(cache.sector_valid[set_index][block_idx]) for block_idx in range(cache.blocks_per_set)]
+			for set_index in range(cache.num_of_sets)], dtype=np.bool_)
+
+	if log != None:
+		state["counters"] = np.array([getattr(log, counter) for counter in COUNTERS], dtype=np.int64)
+
+	if ram:
+		if not is_reference(cache):
+			raise Exception("The fast engine does not model RAM contents")
+		state["ram"] = np.stack([block.data for block in cache.ram.data])
+
+	#Pass a file object so numpy does not append .npz to the given name
+	with open(path, "wb") as f:
+		np.savez_compressed(f, **state)
+
+
+def restore(path, cache, log = None, mmu = None):
+	#Load cache state from path into a cache of the same geometry; log, if given, gets the saved counters back.
+	#With an mmu the checkpoint must hold matching TLBs, so warm cache state is never paired with cold TLBs
+	with np.load(path, allow_pickle = False) as state:
+
+		if int(state["checkpoint_version"]) != CHECKPOINT_VERSION:
+			raise Exception("Checkpoint version {} not supported".format(int(state["checkpoint_version"])))
+
+		geometry = [int(x) for x in state["geometry"]]
+		if geometry != [cache.conf.block_size, cache.num_of_sets, cache.blocks_per_set]:
+			raise Exception("Checkpoint geometry (block_size, sets, ways) {} does not match cache {}".format(
+				geometry, [cache.conf.block_size, cache.num_of_sets, cache.blocks_per_set]))
+
+		if str(state["replacement"]) != cache.conf.replacement:
+			raise Exception("Checkpoint replacement {} does not match cache {}".format(str(state["replacement"]), cache.conf.replacement))
+
+		#Sectored and unsectored lines hold different state, so a checkpoint only fits the sector size it was saved with
+		saved_sectors = state["sector_valid"].shape[2] if "sector_valid" in state.files else 1
+		if saved_sectors != sectors_per_block(cache):
+			raise Exception("Checkpoint has {} sectors per block, cache has {}".format(saved_sectors, sectors_per_block(cache)))
+
+		if mmu != None:
+			restore_tlbs(state, mmu)
+
+		if getattr(cache, "partition", None) != None:
+			restore_partition(state, cache.partition)
+
+		np.random.set_state(rng_state(state, "rng"))
+		cache.clock = int(state["clock"])
+
+		if is_reference(cache):
+			if "ram" in state.files:
+				ram = state["ram"]
+				if ram.shape[0] != len(cache.ram.data):
+					raise Exception("Checkpoint RAM has {} blocks, RAM has {}".format(ram.shape[0], len(cache.ram.data)))
+				for block, data in zip(cache.ram.data, ram):
+					block.data[:] = data
+
+			#Every state[...] reads and decompresses the array again, so convert each one once
+			valid = state["valid"].tolist()
+			tags = state["tags"].tolist()
+			last_visited = state["last_visited"].tolist()
+			last_loaded = state["last_loaded"].tolist()
+			dirty = state["dirty"].tolist()
+
+			#Cache ways point at RAM blocks (auto write back), so re-link each valid way to its RAM block
+			for set_index in range(cache.num_of_sets):
+				for block_idx in range(cache.blocks_per_set):
+					cache.valid[set_index][block_idx] = valid[set_index][block_idx]
+					cache.tags[set_index][block_idx] = tags[set_index][block_idx]
+					if valid[set_index][block_idx]:
+						block = cache.ram.data[tags[set_index][block_idx] * cache.num_of_sets + set_index]
+						block.set_last_visited_time(last_visited[set_index][block_idx])
+						block.set_last_loaded_time(last_loaded[set_index][block_idx])
+						block.dirty = dirty[set_index][block_idx]
+						cache.blocks[set_index][block_idx] = block
+			if saved_sectors > 1:
+				#Fully valid lines share the cache's all-valid tuple, as after a full-line fill
+				sector_valid = state["sector_valid"].tolist()
+				for set_index in range(cache.num_of_sets):
+					for block_idx in range(cache.blocks_per_set):
+						sectors = sector_valid[set_index][block_idx]
+						cache.sector_valid[set_index][block_idx] = cache.all_sectors_valid if all(sectors) else sectors
+			cache.pending_random = state["pending_random"].tolist()
+			cache.pending_pos = 0
+		else:
+			cache.tags[:] = state["tags"]
+			cache.valid[:] = state["valid"]
+			cache.last_visited[:] = state["last_visited"]
+			cache.last_loaded[:] = state["last_loaded"]
+			cache.dirty[:] = state["dirty"]
+			cache.rand_ways = state["pending_random"].astype(np.int64)
+			cache.rand_pos = 0
+
+		if log != None and "counters" in state.files:
+			for counter, value in zip(COUNTERS, state["counters"]):
+				setattr(log, counter, int(value))
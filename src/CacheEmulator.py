@@ -7,12 +7,31 @@ Class: Computer Architecture
 
 import numpy as np
 import argparse
+import itertools
 import math
-from time import time
+from time import perf_counter
 from copy import deepcopy
 
+#Bump whenever a model change alters counters; it is part of the sweep result cache key
+SIMULATOR_VERSION = "2"
+
+#Problem sizes each algorithm runs with. Shared by both engines and the result cache key.
+WORKLOAD_PARAMS = {
+	"dot": {"n": 20000},
+	"mxm": {"x": 100, "y": 100, "z": 100},
+	"mxm_block": {"x": 100, "y": 100, "z": 100, "mxm_block_size": None},
+	"dot_vector": {"n": 20000},
+	"colocate": {"n": 20000, "x": 100, "y": 100, "z": 100, "mxm_block_size": None},
+}
+
+#Counters of variable-width accesses, registered on the first CPU.load / CPU.store
+WIDE_COUNTERS = ("unaligned_accesses", "split_accesses", "sector_misses", "bytes_from_ram")
+
 conf = None #Save Running Configuration
 logging = None #Save Stats
+timer = None #Save Per-Phase Wall Time
+profile = None #Save Per-Access Time Breakdown, Only When Profiling
+checkpoint = None #Save Checkpoint Paths: {"load": path, "save": path, "ram": bool}
 
 class Logging():
 	def __init__(self):
@@ -24,28 +43,38 @@ class Logging():
 		self.write_misses = 0
 		self.log_flag = False
 
-	def log(self,log_type):
+	def log(self,log_type, amount = 1):
 		if self.log_flag == False:
 			return 
 
 		if log_type == "read_hits":
-			self.read_hits += 1
+			self.read_hits += amount
 
 		elif log_type == "instruction_cnt":
-			self.instruction_cnt += 1
+			self.instruction_cnt += amount
 
 		elif log_type == "read_misses":
-			self.read_misses += 1
+			self.read_misses += amount
 
 		elif log_type == "write_hits":
-			self.write_hits += 1
+			self.write_hits += amount
 
 		elif log_type == "write_misses":
-			self.write_misses += 1
+			self.write_misses += amount
+
+		elif log_type in self.__dict__ and log_type != "log_flag":
+			#Counters of optional models (TLB, timing, ...), see register()
+			setattr(self, log_type, getattr(self, log_type) + amount)
 
 		else:
 			raise Exception("Unknown log_type {}".format(log_type))
 
+	def register(self, *log_types):
+		#Add counters for an optional model; only registered counters are printed and stored
+		for log_type in log_types:
+			if log_type not in self.__dict__:
+				setattr(self, log_type, 0)
+
 	def on(self):
 		#Turn on logging
 		self.log_flag = True
@@ -58,9 +87,54 @@ class Logging():
 		#Print, for debug
 		return "\t".join(["{}:{}".format(attr,value)for attr, value in self.__dict__.items()]) + "\n"
 
+class Timer():
+	#Wall time per phase (startup, setup, simulate, verify) of one run
+	def __init__(self):
+
+		self.phases = {}
+		self.current = None
+		self.start_time = None
+
+		#Optional profiler (enable/disable) run around the simulate phase only
+		self.profiler = None
+
+	def start(self, phase):
+		#Close the running phase and open a new one
+		self.stop()
+		self.current = phase
+		if phase == "simulate" and self.profiler != None:
+			self.profiler.enable()
+		self.start_time = perf_counter()
+
+	def stop(self):
+		if self.current == None:
+			return
+
+		self.phases[self.current] = self.phases.get(self.current, 0) + perf_counter() - self.start_time
+		if self.current == "simulate" and self.profiler != None:
+			self.profiler.disable()
+		self.current = None
+
+	def __repr__(self):
+		return "\t".join(["{}:{:.6f}s".format(phase,value)for phase, value in self.phases.items()]) + "\n"
+
+class AccessProfile():
+	#Accumulated time spent in lookup / fill / eviction by ProfiledCache
+	def __init__(self):
+
+		self.seconds = {"lookup": 0.0, "fill": 0.0, "eviction": 0.0}
+		self.counts = {"lookup": 0, "fill": 0, "eviction": 0}
+
+	def add(self, category, seconds):
+		self.seconds[category] += seconds
+		self.counts[category] += 1
+
 class Configuration():
 
-	def __init__(self, cache_size, block_size, associativity, replacement, algorithm):
+	def __init__(self, cache_size, block_size, associativity, replacement, algorithm,
+		page_size = None, tlb = ((64, 4), (1536, 12)), tlb_latency = (0, 7), tlb_replacement = "LRU", walk_latency = 25,
+		hit_latency = 4, miss_latency = 100, mshrs = None, sector_size = None, vector_width = 32, data_offset = 0,
+		tile = None, loop_order = "jik", tenants = 1, way_masks = None, partitioner = None, repartition_interval = 5000, umon_sets = 16):
 		#Global Variable Recording configurations
 
 		self.size_of_double = 8 #8 bytes each double
@@ -81,10 +155,89 @@ class Configuration():
 		self.replacement = replacement 
 		self.algorithm = algorithm
 
+		# Sectored lines: each block has block_size / sector_size valid bits (None: one sector per block)
+		if sector_size != None and (sector_size <= 0 or block_size % sector_size != 0):
+			raise Exception("Block size {} is not a multiple of sector size {}".format(block_size, sector_size))
+		self.sector_size = sector_size
+		self.sectors_per_block = block_size // sector_size if sector_size != None else 1
+
+		# dot_vector: bytes per load, and byte offset of the arrays (non-zero -> unaligned loads)
+		self.vector_width = vector_width
+		self.data_offset = data_offset
+
+		# mxm_block tiling: (rows of A/C, columns of B/C, shared k) per tile (None: square x/10),
+		# and the order of the three tile loops, outermost first
+		if sorted(loop_order) != ["i", "j", "k"]:
+			raise Exception("Loop order {} is not a permutation of ijk".format(loop_order))
+		if tile != None and (len(tile) != 3 or min(tile) < 1):
+			raise Exception("Tile {} needs three positive sizes".format(tile))
+		self.tile = list(tile) if tile != None else None
+		self.loop_order = loop_order
+
+		# Virtual memory (off when page_size is None). tlb is (entries, ways) per level, L1 first
+		self.page_size = page_size
+		self.tlb = [list(level) for level in tlb]
+		self.tlb_latency = list(tlb_latency) # Cycles to look up each TLB level
+		self.tlb_replacement = tlb_replacement
+		self.walk_latency = walk_latency # Cycles per page table level on a page walk
+
+		# Timing model: cycles are counted only when a model that needs them is on
+		self.hit_latency = hit_latency
+		self.miss_latency = miss_latency
+
+		# Non-blocking cache: number of MSHRs (None: blocking, every access waits its full latency)
+		if mshrs != None and mshrs < 1:
+			raise Exception("Need at least one MSHR")
+		self.mshrs = mshrs
+
+		self.timing = page_size != None or mshrs != None
+
+		# Shared cache tenants (stream IDs). way_masks are CAT-style fill masks, one per tenant (None: all ways).
+		# partitioner "ucp" re-divides the ways every repartition_interval accesses from shadow tags on umon_sets sampled sets
+		if way_masks != None:
+			tenants = len(way_masks)
+			for mask in way_masks:
+				if mask <= 0 or mask >= 1 << associativity:
+					raise Exception("Way mask {} does not select any of the {} ways".format(hex(mask), associativity))
+		if algorithm == "colocate":
+			tenants = max(tenants, 2) # The co-located jobs are tenants 0 and 1
+		if partitioner != None and partitioner != "ucp":
+			raise Exception("Unknown partitioner {}".format(partitioner))
+		if partitioner != None and associativity < tenants:
+			raise Exception("Utility-based partitioning needs at least one way per tenant")
+		self.tenants = tenants
+		self.way_masks = list(way_masks) if way_masks != None else None
+		self.partitioner = partitioner
+		self.repartition_interval = repartition_interval
+		self.umon_sets = umon_sets
+
 	def __repr__(self):
 		
 		return "\t".join(["{}:{}".format(attr,value)for attr, value in self.__dict__.items()]) + "\n"
 
+def parse_size(text):
+	#"4096", "4K", "2M", "1G" -> bytes
+	units = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+	text = text.strip().upper().rstrip("B")
+	if text and text[-1] in units:
+		return int(text[:-1]) * units[text[-1]]
+	return int(text)
+
+def configuration_from_args(args):
+	tlb = [tuple(int(x) for x in level.split(":")) for level in args.tlb.split(",")]
+	tlb_latency = [int(x) for x in args.tlb_latency.split(",")]
+	if len(tlb_latency) != len(tlb):
+		raise Exception("--tlb-latency needs one value per TLB level")
+
+	return Configuration(args.cache_size, args.block_size, args.associativity, args.replacement, args.algorithm,
+		page_size = parse_size(args.page_size) if args.page_size != None else None, tlb = tlb, tlb_latency = tlb_latency,
+		tlb_replacement = args.tlb_replacement, walk_latency = args.walk_latency,
+		hit_latency = args.hit_latency, miss_latency = args.miss_latency, mshrs = args.mshrs,
+		sector_size = args.sector_size, vector_width = args.vector_width, data_offset = args.offset,
+		tile = [int(x) for x in args.tile.split(",")] if args.tile != None else None, loop_order = args.loop_order,
+		tenants = args.tenants, way_masks = [int(x, 0) for x in args.way_masks.split(",")] if args.way_masks != None else None,
+		partitioner = args.partitioner, repartition_interval = args.repartition_interval, umon_sets = args.umon_sets)
+
 
 class Address():
 	#An Address Specified By An Integer (I.e. Byte Address).
@@ -134,7 +287,7 @@ class DataBlock():
 			raise Exception("conf.block_size %% conf.size_of_double != 0:")
 
 		self.num_of_doubles = conf.block_size // conf.size_of_double
-		self.data = np.zeros(self.num_of_doubles, dtype=np.float);
+		self.data = np.zeros(self.num_of_doubles, dtype=np.float64);
 
 		#The Time It's Last Visited By CPU
 		self.last_visited_time = None
@@ -142,6 +295,9 @@ class DataBlock():
 		#The Time It's Recent Loaded Into Cache
 		self.last_loaded_time = None
 
+		#Written Since It Was Loaded Into Cache
+		self.dirty = False
+
 	def __repr__(self):
 		return repr(self.data) + "\n"
 
@@ -166,6 +322,20 @@ class DataBlock():
 
 		self.data[int(key/8)] = val
 
+	def getBytes(self,key,width):
+		#return width bytes starting at byte offset key
+		if key + width > conf.block_size:
+			raise Exception("Indexing Outside Block")
+
+		return self.data.view(np.uint8)[key:key + width].copy()
+
+	def setBytes(self,key,val):
+		#set bytes starting at byte offset key
+		if key + len(val) > conf.block_size:
+			raise Exception("Indexing Outside Block")
+
+		self.data.view(np.uint8)[key:key + len(val)] = val
+
 	def set_last_visited_time(self,time):
 		self.last_visited_time = time
 
@@ -174,31 +344,187 @@ class DataBlock():
 
 class CPU():
 	def __init__(self):
-		self.cache = Cache()
+		self.cache = Cache() if profile == None else ProfiledCache()
+		self.mmu = MMU() if conf.page_size != None else None
 
 	def getDouble(self,address):
 		#Load a double from cache.
 		if address % 8 != 0:
 			raise Exception("Loading Double Should Use Start Address")
 
+		if conf.sector_size != None:
+			#Sectored lines need the byte-granular path
+			return self.load(address, 8).view(np.float64)[0]
+
 		logging.log("instruction_cnt")
+		if self.mmu != None:
+			address = self.mmu.translate(address)
 		return self.cache.getDouble(address)
 
 	def setDouble(self, address, value):
 		if address % 8 != 0:
 			raise Exception("Storing Double Should Use Start Address")
 
+		if conf.sector_size != None:
+			self.store(address, np.array([value], dtype=np.float64).view(np.uint8))
+			return
+
 		logging.log("instruction_cnt")
+		if self.mmu != None:
+			address = self.mmu.translate(address)
 		self.cache.setDouble(address, value)
 
+	def load(self, address, width):
+		#Load width (1-64) bytes from any byte address, e.g. a SIMD load. Returns a uint8 array.
+		if width < 1 or width > 64:
+			raise Exception("Access Width Should Be 1-64 Bytes")
+
+		logging.log("instruction_cnt")
+		return np.concatenate([self.cache.getBytes(piece, size) for piece, size in self.translate_pieces(self.split(address, width))])
+
+	def store(self, address, data):
+		#Store a uint8 array of 1-64 bytes to any byte address
+		if len(data) < 1 or len(data) > 64:
+			raise Exception("Access Width Should Be 1-64 Bytes")
+
+		logging.log("instruction_cnt")
+		done = 0
+		for piece, size in self.translate_pieces(self.split(address, len(data))):
+			self.cache.setBytes(piece, data[done:done + size])
+			done += size
+
+	def translate_pieces(self, pieces):
+		#An access crossing a page boundary needs one translation per page it touches
+		if self.mmu == None:
+			return pieces
+		translated = []
+		page = None
+		for piece, size in pieces:
+			if piece.address // self.mmu.page_size != page:
+				page = piece.address // self.mmu.page_size
+				piece = self.mmu.translate(piece)
+			translated.append((piece, size))
+		return translated
+
+	def split(self, address, width):
+		#Cut an access into per-line pieces; an access touching two or more lines is a split access
+		logging.register(*WIDE_COUNTERS)
+
+		if address % width != 0:
+			logging.log("unaligned_accesses")
+
+		start = address.address
+		end = start + width
+		pieces = []
+		while start < end:
+			line_end = (start // conf.block_size + 1) * conf.block_size
+			pieces.append((Address(start), min(end, line_end) - start))
+			start = line_end
+
+		if len(pieces) > 1:
+			logging.log("split_accesses")
+		return pieces
+
 	def addDouble(self,val1, val2):
 		logging.log("instruction_cnt")
+		if conf.timing:
+			logging.log("cycles")
 		return val1 + val2
 
 	def multDouble(self, val1, val2):
 		logging.log("instruction_cnt")
+		if conf.timing:
+			logging.log("cycles")
 		return val1 * val2
 
+class TLB():
+	#One TLB level: a set-associative cache of virtual page numbers
+	def __init__(self, entries, associativity, replacement):
+
+		if entries % associativity != 0:
+			raise Exception("TLB entries {} not a multiple of associativity {}".format(entries, associativity))
+
+		self.blocks_per_set = associativity
+		self.num_of_sets = entries // associativity
+		self.replacement = replacement
+		self.pages = [[None for j in range(self.blocks_per_set)] for i in range(self.num_of_sets)]
+		self.last_visited = [[0 for j in range(self.blocks_per_set)] for i in range(self.num_of_sets)]
+		self.last_loaded = [[0 for j in range(self.blocks_per_set)] for i in range(self.num_of_sets)]
+		self.clock = 0
+
+		#Own generator so TLB victims do not shift the cache's random replacement sequence
+		self.random = np.random.RandomState(0)
+
+	def lookup(self, page):
+		self.clock += 1
+		set_index = page % self.num_of_sets
+
+		for way in range(self.blocks_per_set):
+			if self.pages[set_index][way] == page:
+				self.last_visited[set_index][way] = self.clock
+				return True
+
+		return False
+
+	def insert(self, page):
+		self.clock += 1
+		set_index = page % self.num_of_sets
+
+		if None in self.pages[set_index]:
+			way = self.pages[set_index].index(None)
+		elif self.replacement == "LRU":
+			way = self.last_visited[set_index].index(min(self.last_visited[set_index]))
+		elif self.replacement == "FIFO":
+			way = self.last_loaded[set_index].index(min(self.last_loaded[set_index]))
+		elif self.replacement == "random":
+			way = self.random.randint(self.blocks_per_set)
+		else:
+			raise Exception("Unknown Replacement Type")
+
+		self.pages[set_index][way] = page
+		self.last_visited[set_index][way] = self.clock
+		self.last_loaded[set_index][way] = self.clock
+
+class MMU():
+	#Virtual to physical translation through multi-level TLBs and a radix page table walk.
+	#Pages are identity mapped: the kernels initialise RAM by address, so physical == virtual.
+	def __init__(self):
+
+		if conf.page_size & (conf.page_size - 1) != 0:
+			raise Exception("Page size {} is not a power of two".format(conf.page_size))
+
+		self.page_size = conf.page_size
+		self.tlbs = [TLB(entries, associativity, conf.tlb_replacement) for entries, associativity in conf.tlb]
+
+		#x86-64 style: 48-bit virtual addresses, 9 bits per page table level (4K: 4 levels, 2M: 3, 1G: 2)
+		self.walk_levels = int(math.ceil((48 - math.log2(self.page_size)) / 9))
+
+		for level in range(1, len(self.tlbs) + 1):
+			logging.register("tlb{}_hits".format(level), "tlb{}_misses".format(level))
+		logging.register("page_walks", "walk_cycles")
+
+	def translate(self, address):
+		page = address // self.page_size
+
+		for level, tlb in enumerate(self.tlbs):
+			logging.log("cycles", conf.tlb_latency[level])
+			if tlb.lookup(page):
+				logging.log("tlb{}_hits".format(level + 1))
+				#Fill the levels above that missed
+				for upper in self.tlbs[:level]:
+					upper.insert(page)
+				return address
+			logging.log("tlb{}_misses".format(level + 1))
+
+		walk_cycles = self.walk_levels * conf.walk_latency
+		logging.log("page_walks")
+		logging.log("walk_cycles", walk_cycles)
+		logging.log("cycles", walk_cycles)
+		for tlb in self.tlbs:
+			tlb.insert(page)
+
+		return address
+
 class Cache():
 	def __init__(self):
 	
@@ -207,8 +533,24 @@ class Cache():
 		self.blocks = [[DataBlock() for j in range(self.blocks_per_set)] for i in range(self.num_of_sets)]
 		self.valid = [[False for j in range(self.blocks_per_set)] for i in range(self.num_of_sets)]
 		self.tags = [[0 for j in range(self.blocks_per_set)]for i in range(self.num_of_sets)]
+		#Per-sector valid bits of each way. A full-line fill shares the all-valid tuple; partial fills get their own list.
+		self.all_sectors_valid = tuple(True for k in range(conf.sectors_per_block))
+		self.sector_valid = [[self.all_sectors_valid for j in range(self.blocks_per_set)] for i in range(self.num_of_sets)]
 		self.ram = RAM()
 		self.conf = conf
+		self.mshr = MSHRFile(conf.mshrs) if conf.mshrs != None else None
+		self.partition = WayPartition(self.num_of_sets, self.blocks_per_set) if conf.tenants > 1 else None
+
+		#Logical clock for recency. Advances once per cache access, so LRU decisions are deterministic
+		self.clock = 0
+
+		#Random victims restored from a FastCache checkpoint: drawn before the save, used before any new draw
+		self.pending_random = []
+		self.pending_pos = 0
+
+	def tick(self):
+		self.clock += 1
+		return self.clock
 
 	def getDouble(self,address):
 		global logging
@@ -220,12 +562,20 @@ class Cache():
 		# If the current block in cache, return the double from the block.
 		if find_block_result != None:
 			logging.log("read_hits")
-			find_block_result.set_last_visited_time(time())
+			if self.conf.timing:
+				self.account(address, True)
+			if self.partition != None:
+				self.partition.access(address, True)
+			find_block_result.set_last_visited_time(self.tick())
 			return find_block_result.getDouble(address.getOffset())
 
 		# Otherwise load the block into cache and return the block
 		else:
 			logging.log("read_misses")
+			if self.conf.timing:
+				self.account(address, False)
+			if self.partition != None:
+				self.partition.access(address, False)
 			return self.load_block_from_ram(address).getDouble(address.getOffset())
 
 	def setDouble(self, address, val):
@@ -237,20 +587,40 @@ class Cache():
 		# If the current block in cache, return the double from the block.
 		if find_block_result != None:
 			logging.log("write_hits")
-			find_block_result.set_last_visited_time(time())
+			if self.conf.timing:
+				self.account(address, True)
+			if self.partition != None:
+				self.partition.access(address, True)
+			find_block_result.set_last_visited_time(self.tick())
 			find_block_result.setDouble(address.getOffset(),val)
+			find_block_result.dirty = True
 
 		# Otherwise load the block into cache and return the block
 		else:
 			logging.log("write_misses")
-			self.load_block_from_ram(address).setDouble(address.getOffset(),val)
+			if self.conf.timing:
+				self.account(address, False)
+			if self.partition != None:
+				self.partition.access(address, False)
+			block = self.load_block_from_ram(address)
+			block.setDouble(address.getOffset(),val)
+			block.dirty = True
+
+	def account(self, address, hit):
+		#Cycles of one access: its full latency when blocking, or its place on the MSHR timeline when non-blocking
+		if self.mshr == None:
+			logging.log("cycles", self.conf.hit_latency if hit else self.conf.miss_latency)
+		elif hit:
+			self.mshr.hit(address // self.conf.block_size)
+		else:
+			self.mshr.miss(address // self.conf.block_size)
 
 	def load_block_from_ram(self, address):
 		#Retrieve datablock from RAM if not in cache and place in cache.
 
 		#print("load_block_from_ram")
 
-		current_time = time()
+		current_time = self.tick()
 
 		#block = deepcopy(self.ram.getBlock(address))
 		#If you don't use deepcopy here, then it returns the references, and it's automatically write-through with write-back
@@ -259,65 +629,77 @@ class Cache():
 
 		block.set_last_loaded_time(current_time)
 		block.set_last_visited_time(current_time)
+		block.dirty = False
 
 		set_index_of_address = address.getIndex()
 
-		for block_idx in range(self.blocks_per_set):
+		#With partitioning, the current tenant may only fill (and evict) the ways in its mask
+		ways = range(self.blocks_per_set) if self.partition == None else self.partition.ways()
+
+		for block_idx in ways:
 			# If there's space in the corresponding set
 			if self.valid[set_index_of_address][block_idx] == False:
 				self.valid[set_index_of_address][block_idx] = True
 				self.tags[set_index_of_address][block_idx] = address.getTag()
 				self.blocks[set_index_of_address][block_idx] = block
+				self.sector_valid[set_index_of_address][block_idx] = self.all_sectors_valid
+				if self.partition != None:
+					self.partition.fill(set_index_of_address, block_idx, False)
 				return block
 
 		#If there's no space in the corresponding set
 		#Perform replace algo.
+		evict_idx = self.choose_victim(set_index_of_address, ways)
+		if self.partition != None:
+			self.partition.fill(set_index_of_address, evict_idx, True)
+
+		#write back ignored because ram and cache referring to same instance. -- auto write back
+
+		#Replace it with new one
+		self.tags[set_index_of_address][evict_idx] = address.getTag() #Set Tag
+		self.blocks[set_index_of_address][evict_idx] = block #Set Block
+		self.sector_valid[set_index_of_address][evict_idx] = self.all_sectors_valid
+
+		return block
+
+	def choose_victim(self, set_index_of_address, ways = None):
+		#Pick the way to evict from a full set, among ways (default: all of them)
+		if ways == None:
+			ways = range(self.blocks_per_set)
+
 		if self.conf.replacement == "LRU":
 			#print("LRU")
 
 			lru_index = None
 
-			for block_idx in range(self.blocks_per_set):
+			for block_idx in ways:
 				# If there's no space in the corresponding set. Then valid bit are all True
 
 				#Find lru index
 				lru_index = block_idx if lru_index == None or self.blocks[set_index_of_address][block_idx].last_visited_time < self.blocks[set_index_of_address][lru_index].last_visited_time else lru_index
 
-			#write back ignored because ram and cache referring to same instance. -- auto write back
-
-			#Replace it with new one
-			self.tags[set_index_of_address][lru_index] = address.getTag() #Set Tag
-			self.blocks[set_index_of_address][lru_index] = block #Set Block
+			return lru_index
 
 		elif self.conf.replacement == "random":
-			rand_evict_idx = np.random.randint(self.blocks_per_set) #Randomly evict one 
-
-			#write back ignored because ram and cache referring to same instance. -- auto write back
-
-			#Replace it with new one
-			self.tags[set_index_of_address][rand_evict_idx] = address.getTag() #Set Tag
-			self.blocks[set_index_of_address][rand_evict_idx] = block #Set Block
+			if self.pending_pos < len(self.pending_random) and len(ways) == self.blocks_per_set:
+				self.pending_pos += 1
+				return ways[self.pending_random[self.pending_pos - 1]]
+			return ways[np.random.randint(len(ways))] #Randomly evict one 
 
 		elif self.conf.replacement == "FIFO":
 			fifo_index = None
 
-			for block_idx in range(self.blocks_per_set):
+			for block_idx in ways:
 				# If there's no space in the corresponding set. Then valid bit are all True
 
 				#Find lru index
 				fifo_index = block_idx if fifo_index == None or self.blocks[set_index_of_address][block_idx].last_visited_time < self.blocks[set_index_of_address][fifo_index].last_visited_time else fifo_index
 
-			#write back ignored because ram and cache referring to same instance. -- auto write back
-			
-			#Replace it with new one
-			self.tags[set_index_of_address][fifo_index] = address.getTag() #Set Tag
-			self.blocks[set_index_of_address][fifo_index] = block #Set Block
+			return fifo_index
 
 		else:
 			raise Exception("Unknown Replacement Type")
 
-		return block
-
 	"""
 	def mapped_set_full(self,address):
 		# A Block is mapped to a set (set size 1 - xxx)
@@ -332,6 +714,76 @@ class Cache():
 		return True
 	"""
 
+	def getBytes(self, address, width):
+		#Read width bytes that lie inside one line
+		return self.access_line(address, width, "read").getBytes(address.getOffset(), width)
+
+	def setBytes(self, address, val):
+		#Write bytes that lie inside one line
+		self.access_line(address, len(val), "write").setBytes(address.getOffset(), val)
+
+	def access_line(self, address, width, kind):
+		#Lookup and fill for one line, sector by sector. kind is "read" or "write".
+		#A tag hit with some needed sector invalid is a sector miss: only the missing sectors are fetched.
+		set_index_of_address = address.getIndex()
+		sector_size = self.conf.block_size // self.conf.sectors_per_block
+		first_sector = address.getOffset() // sector_size
+		needed = range(first_sector, (address.getOffset() + width - 1) // sector_size + 1)
+
+		way = self.find_way(address)
+		if way != None:
+			block = self.blocks[set_index_of_address][way]
+			block.set_last_visited_time(self.tick())
+			missing = [sector for sector in needed if not self.sector_valid[set_index_of_address][way][sector]]
+
+			if not missing:
+				logging.log(kind + "_hits")
+				if self.conf.timing:
+					self.account(address, True)
+			else:
+				logging.log(kind + "_misses")
+				logging.log("sector_misses")
+				if self.conf.timing:
+					self.account(address, False)
+			if self.partition != None:
+				self.partition.access(address, not missing)
+
+			if missing:
+				sector_valid = list(self.sector_valid[set_index_of_address][way])
+				for sector in missing:
+					sector_valid[sector] = True
+				self.sector_valid[set_index_of_address][way] = sector_valid
+				logging.log("bytes_from_ram", len(missing) * sector_size)
+
+		else:
+			logging.log(kind + "_misses")
+			if self.conf.timing:
+				self.account(address, False)
+			if self.partition != None:
+				self.partition.access(address, False)
+			#RAM hands out blocks by their start address
+			block = self.load_block_from_ram(Address(address.address - address.getOffset()))
+			#Not a lookup: only finds where the fill went, so it bypasses ProfiledCache
+			way = Cache.find_way(self, address)
+			if self.conf.sectors_per_block > 1:
+				self.sector_valid[set_index_of_address][way] = [sector in needed for sector in range(self.conf.sectors_per_block)]
+			logging.log("bytes_from_ram", len(needed) * sector_size)
+
+		if kind == "write":
+			block.dirty = True
+		return block
+
+	def find_way(self,address):
+		#Way holding the block of address, or None
+		set_index_of_address = address.getIndex()
+		tag_of_address = address.getTag()
+
+		for block_idx in range(self.blocks_per_set):
+			if self.valid[set_index_of_address][block_idx] == True and self.tags[set_index_of_address][block_idx] == tag_of_address:
+				return block_idx
+
+		return None
+
 	def find_block_in_cache(self,address):
 		#See if the block is in cache
 
@@ -355,6 +807,207 @@ class Cache():
 		return string
 
 
+class MSHRFile():
+	#Miss status holding registers of a non-blocking cache, on a timeline measured by logging.cycles.
+	#The CPU issues one access per cycle without waiting for misses. A miss takes a free MSHR until
+	#it completes miss_latency cycles later; a later access to a block still in flight merges into
+	#its MSHR. When all MSHRs are busy the CPU stalls until the oldest miss completes.
+	#Data still moves instantly (the functional model is unchanged); only time is modelled.
+	def __init__(self, entries):
+
+		self.entries = entries
+		self.in_flight = {} #block number -> cycle its fill completes
+
+		logging.register("mshr_allocations", "mshr_merges", "mshr_stalls", "stall_cycles", "peak_outstanding")
+
+	def retire(self):
+		now = logging.cycles
+		for block_number in [block_number for block_number, ready in self.in_flight.items() if ready <= now]:
+			del self.in_flight[block_number]
+
+	def hit(self, block_number):
+		self.retire()
+		if block_number in self.in_flight:
+			#Secondary miss: the tags hit, but the data is still on its way
+			logging.log("mshr_merges")
+		logging.log("cycles")
+
+	def miss(self, block_number):
+		self.retire()
+
+		if block_number in self.in_flight:
+			logging.log("mshr_merges")
+			logging.log("cycles")
+			return
+
+		if len(self.in_flight) >= self.entries:
+			stall = min(self.in_flight.values()) - logging.cycles
+			logging.log("mshr_stalls")
+			logging.log("stall_cycles", stall)
+			logging.log("cycles", stall)
+			self.retire()
+
+		self.in_flight[block_number] = logging.cycles + conf.miss_latency
+		logging.log("mshr_allocations")
+		if len(self.in_flight) > logging.peak_outstanding:
+			logging.peak_outstanding = len(self.in_flight)
+		logging.log("cycles")
+
+	def drain(self):
+		#Wait for outstanding misses at the end of the run. Logging is already off then, so add directly.
+		if self.in_flight:
+			logging.cycles = max(logging.cycles, max(self.in_flight.values()))
+			self.in_flight = {}
+
+
+class WayPartition():
+	#CAT-style way partitioning of a shared cache. The workload sets tenant (its stream ID) before each access.
+	#Lookups hit in any way, but a fill may only take (or evict) a way in the tenant's mask, so one tenant
+	#cannot push another's blocks out of the ways reserved for it. Keeps hits, misses and evictions per tenant.
+	def __init__(self, num_of_sets, blocks_per_set):
+
+		self.num_of_sets = num_of_sets
+		self.blocks_per_set = blocks_per_set
+		self.tenants = conf.tenants
+		self.tenant = 0
+		self.owner = [[None for j in range(blocks_per_set)] for i in range(num_of_sets)] #Tenant that filled each way
+		self.accesses = 0
+
+		#Counter names per tenant, built once
+		self.hit_counters = ["tenant{}_hits".format(t) for t in range(self.tenants)]
+		self.miss_counters = ["tenant{}_misses".format(t) for t in range(self.tenants)]
+		self.eviction_counters = ["tenant{}_evictions".format(t) for t in range(self.tenants)]
+		self.cross_counters = ["tenant{}_cross_evictions".format(t) for t in range(self.tenants)]
+		for t in range(self.tenants):
+			logging.register(self.hit_counters[t], self.miss_counters[t], self.eviction_counters[t], self.cross_counters[t], "tenant{}_ways".format(t))
+
+		self.umons = None
+		if conf.partitioner == "ucp":
+			logging.register("repartitions")
+			sample_stride = max(num_of_sets // conf.umon_sets, 1)
+			self.umons = [UtilityMonitor(blocks_per_set, sample_stride) for t in range(self.tenants)]
+
+		if conf.way_masks != None:
+			self.set_masks(conf.way_masks)
+		elif self.umons != None:
+			#Start utility-based partitioning from an even split
+			self.set_masks(self.contiguous_masks([blocks_per_set // self.tenants + (1 if t < blocks_per_set % self.tenants else 0) for t in range(self.tenants)]))
+		else:
+			self.set_masks([(1 << blocks_per_set) - 1 for t in range(self.tenants)])
+
+	def set_masks(self, masks):
+		self.masks = list(masks)
+		self.ways_of = [[way for way in range(self.blocks_per_set) if mask >> way & 1] for mask in self.masks]
+		#Current allocation, set directly like MSHRFile's peak_outstanding
+		for t in range(self.tenants):
+			setattr(logging, "tenant{}_ways".format(t), len(self.ways_of[t]))
+
+	def contiguous_masks(self, allocation):
+		#Way counts per tenant -> adjacent bit ranges, tenant 0 in the lowest ways
+		masks = []
+		start = 0
+		for ways in allocation:
+			masks.append(((1 << ways) - 1) << start)
+			start += ways
+		return masks
+
+	def ways(self):
+		#Ways the current tenant may fill
+		if self.tenant >= self.tenants:
+			raise Exception("Tenant {} but only {} configured".format(self.tenant, self.tenants))
+		return self.ways_of[self.tenant]
+
+	def access(self, address, hit):
+		logging.log(self.hit_counters[self.tenant] if hit else self.miss_counters[self.tenant])
+
+		if self.umons != None:
+			self.umons[self.tenant].access(address)
+			self.accesses += 1
+			if self.accesses % conf.repartition_interval == 0:
+				self.repartition()
+
+	def fill(self, set_index, way, evicted):
+		#The current tenant's block was placed in way; evicted says whether it replaced a valid block
+		victim = self.owner[set_index][way]
+		if evicted and victim != None:
+			logging.log(self.eviction_counters[victim])
+			if victim != self.tenant:
+				logging.log(self.cross_counters[victim])
+		self.owner[set_index][way] = self.tenant
+
+	def repartition(self):
+		#Greedy: every tenant keeps one way, each further way goes to the tenant it would give the most extra hits
+		allocation = [1 for t in range(self.tenants)]
+		for way in range(self.blocks_per_set - self.tenants):
+			gains = [self.umons[t].hits[allocation[t]] for t in range(self.tenants)]
+			allocation[gains.index(max(gains))] += 1
+
+		self.set_masks(self.contiguous_masks(allocation))
+		logging.log("repartitions")
+
+		for umon in self.umons:
+			umon.decay()
+
+
+class UtilityMonitor():
+	#Shadow tags of one tenant as if it had the whole cache, kept for every sample_stride-th set only.
+	#hits[p] counts hits at LRU stack position p, so sum(hits[:w]) estimates the tenant's hits with w ways.
+	def __init__(self, blocks_per_set, sample_stride):
+
+		self.blocks_per_set = blocks_per_set
+		self.sample_stride = sample_stride
+		self.stacks = {} #set index -> block numbers, most recently used first
+		self.hits = [0 for way in range(blocks_per_set)]
+
+	def access(self, address):
+		set_index = address.getIndex()
+		if set_index % self.sample_stride != 0:
+			return
+
+		stack = self.stacks.setdefault(set_index, [])
+		block_number = address // conf.block_size
+		if block_number in stack:
+			position = stack.index(block_number)
+			self.hits[position] += 1
+			del stack[position]
+		elif len(stack) == self.blocks_per_set:
+			stack.pop()
+		stack.insert(0, block_number)
+
+	def decay(self):
+		#Halve the counts so the next interval outweighs older history
+		self.hits = [hits // 2 for hits in self.hits]
+
+
+class ProfiledCache(Cache):
+	#Cache that times lookup, fill and eviction. Only built when profiling, so Cache itself pays nothing.
+	#Fill time includes the nested eviction time; the report subtracts it.
+
+	def find_block_in_cache(self, address):
+		start = perf_counter()
+		result = Cache.find_block_in_cache(self, address)
+		profile.add("lookup", perf_counter() - start)
+		return result
+
+	def find_way(self, address):
+		start = perf_counter()
+		result = Cache.find_way(self, address)
+		profile.add("lookup", perf_counter() - start)
+		return result
+
+	def load_block_from_ram(self, address):
+		start = perf_counter()
+		result = Cache.load_block_from_ram(self, address)
+		profile.add("fill", perf_counter() - start)
+		return result
+
+	def choose_victim(self, set_index_of_address, ways = None):
+		start = perf_counter()
+		result = Cache.choose_victim(self, set_index_of_address, ways)
+		profile.add("eviction", perf_counter() - start)
+		return result
+
+
 class RAM():
 	def __init__(self):
 
@@ -368,6 +1021,27 @@ class RAM():
 
 		return self.data[address // self.conf.block_size]
 
+	def readBytes(self, address, width):
+		#Direct RAM read of any byte range, for kernel setup / checking (not simulated)
+		out = []
+		while width > 0:
+			offset = address % self.conf.block_size
+			size = min(width, self.conf.block_size - offset)
+			out.append(self.data[address // self.conf.block_size].data.view(np.uint8)[offset:offset + size])
+			address += size
+			width -= size
+		return np.concatenate(out)
+
+	def writeBytes(self, address, val):
+		#Direct RAM write of any byte range, for kernel setup (not simulated)
+		done = 0
+		while done < len(val):
+			offset = address % self.conf.block_size
+			size = min(len(val) - done, self.conf.block_size - offset)
+			self.data[address // self.conf.block_size].data.view(np.uint8)[offset:offset + size] = val[done:done + size]
+			address += size
+			done += size
+
 	def setBlock(self):
 		#write back ignored because ram and cache referring to same instance. -- auto write back
 		pass
@@ -377,13 +1051,45 @@ class RAM():
 		return "RAM Status:\n"+"Number of Blocks In Ram:{}\n".format(self.blocks_in_RAM)+"Data:\n{}\n".format(self.data)
 
 
-def dot():
+def start_phase(phase):
+	#Kernels can also be called without main() (conf and logging set by hand); there is no timer then
+	if timer != None:
+		timer.start(phase)
+
+def stop_phase():
+	if timer != None:
+		timer.stop()
+
+def begin_simulation(cache, mmu = None):
+	#Called by every kernel right before its simulated loop
+	if checkpoint != None and checkpoint["load"] != None:
+		import CacheCheckpoint
+		start_phase("checkpoint")
+		CacheCheckpoint.restore(checkpoint["load"], cache, mmu = mmu)
+
+	start_phase("simulate")
+
+def end_simulation(cache, mmu = None):
+	#Called by every kernel right after its simulated loop
+	stop_phase()
+
+	if getattr(cache, "mshr", None) != None:
+		cache.mshr.drain()
+
+	if checkpoint != None and checkpoint["save"] != None:
+		import CacheCheckpoint
+		start_phase("checkpoint")
+		CacheCheckpoint.save(checkpoint["save"], cache, ram = checkpoint["ram"], log = logging, mmu = mmu)
+		stop_phase()
+
+def dot(n = 20000):
 	#Dot operation
 	
+	start_phase("startup")
 	myCPU = CPU()
 
 	### Initialize Three Arrays
-	n = 20000
+	start_phase("setup")
 	a = [Address(i * 8) for i in range(0,n)]
 	b = [Address(i * 8) for i in range(n,2*n)]
 	c = Address(2 * n * 8)
@@ -402,6 +1108,7 @@ def dot():
 
 
 	#Start Simulation
+	begin_simulation(myCPU.cache, myCPU.mmu)
 	logging.on()
 	register0 = 0
 	for i in range(n):
@@ -411,7 +1118,9 @@ def dot():
 		register0 = myCPU.addDouble(register0,register3)
 	myCPU.setDouble(c, register0)
 	logging.off()
+	end_simulation(myCPU.cache, myCPU.mmu)
 	#End Simulation
+	start_phase("verify")
 
 	#Debug
 	#register1 = myCPU.getDouble(Address(0 * 8))
@@ -428,14 +1137,92 @@ def dot():
 		cnt += myCPU.cache.ram.data[a[i]//conf.block_size].data[(a[i]//conf.size_of_double)%doubles_per_block] * myCPU.cache.ram.data[b[i]//conf.block_size].data[(b[i]//conf.size_of_double)%doubles_per_block]
 	if cnt != val1:
 		raise Exception("Dot Error")
+	stop_phase()
 
 
 
-def mxm():
-	#see the book for algorithm
+def dot_vector(n = 20000):
+	#Dot product with conf.vector_width-byte SIMD loads over arrays placed conf.data_offset bytes into RAM
+
+	width = conf.vector_width
+	if width % conf.size_of_double != 0:
+		raise Exception("dot_vector needs a vector width that holds whole doubles")
+	lanes = width // conf.size_of_double
+	if n % lanes != 0:
+		raise Exception("dot_vector needs n to be a multiple of {} lanes".format(lanes))
+
+	start_phase("startup")
 	myCPU = CPU()
 
-	x = y = z = 100
+	### Initialize Three Arrays
+	start_phase("setup")
+	a = conf.data_offset
+	b = a + n * conf.size_of_double
+	c = b + n * conf.size_of_double
+
+	### Set Array Val Without Interfering Cache
+	myCPU.cache.ram.writeBytes(a, (1.0 * np.arange(n)).view(np.uint8))
+	myCPU.cache.ram.writeBytes(b, (2.0 * np.arange(n)).view(np.uint8))
+
+	#Start Simulation
+	begin_simulation(myCPU.cache, myCPU.mmu)
+	logging.on()
+	register0 = np.zeros(lanes)
+	for i in range(0, n, lanes):
+		register1 = myCPU.load(Address(a + i * conf.size_of_double), width).view(np.float64)
+		register2 = myCPU.load(Address(b + i * conf.size_of_double), width).view(np.float64)
+		register3 = myCPU.multDouble(register1,register2)
+		register0 = myCPU.addDouble(register0,register3)
+	myCPU.store(Address(c), np.array([register0.sum()]).view(np.uint8))
+	logging.off()
+	end_simulation(myCPU.cache, myCPU.mmu)
+	#End Simulation
+	start_phase("verify")
+
+	#Double Checking Dot Result
+	val1 = myCPU.cache.ram.readBytes(c, conf.size_of_double).view(np.float64)[0]
+	cnt = np.dot(myCPU.cache.ram.readBytes(a, n * conf.size_of_double).view(np.float64), myCPU.cache.ram.readBytes(b, n * conf.size_of_double).view(np.float64))
+	if cnt != val1:
+		raise Exception("Dot Error")
+	stop_phase()
+
+def colocate(n = 20000, x = 100, y = 100, z = 100, mxm_block_size = None, tile = None, loop_order = "jik"):
+	#Two jobs sharing the cache: tenant 0 streams dot(n) over and over, tenant 1 runs one mxm_block.
+	#Their accesses alternate one for one until mxm_block is done. The mxm_block arrays start on the
+	#first page after the dot arrays. Only the memory accesses are replayed (no arithmetic, no result check).
+	import FastCache
+
+	start_phase("startup")
+	myCPU = CPU()
+	partition = myCPU.cache.partition
+
+	start_phase("setup")
+	stream_addresses, stream_writes, stream_ops = FastCache.dot_trace(n)
+	region = -(-len(stream_addresses) * conf.size_of_double // 4096) * 4096
+	block_addresses, block_writes, block_ops = FastCache.mxm_block_trace(x, y, z, mxm_block_size, tile, loop_order)
+	streams = [(stream_addresses.tolist(), stream_writes.tolist()), ((block_addresses + region).tolist(), block_writes.tolist())]
+
+	#Start Simulation
+	begin_simulation(myCPU.cache, myCPU.mmu)
+	logging.on()
+	for m in range(len(block_addresses)):
+		for tenant, (addresses, writes) in enumerate(streams):
+			partition.tenant = tenant
+			position = m % len(addresses)
+			if writes[position]:
+				myCPU.setDouble(Address(addresses[position]), 0.0)
+			else:
+				myCPU.getDouble(Address(addresses[position]))
+	logging.off()
+	end_simulation(myCPU.cache, myCPU.mmu)
+	#End Simulation
+	stop_phase()
+
+def mxm(x = 100, y = 100, z = 100):
+	#see the book for algorithm
+	start_phase("startup")
+	myCPU = CPU()
+	start_phase("setup")
 
 	### Initialize Three Arrays With Address
 	a = [Address(i * 8) for i in range(x*y)] # x * y
@@ -453,6 +1240,9 @@ def mxm():
 	#print(myCPU.cache.ram.data[:376]
 
 	#Start Simulation
+	begin_simulation(myCPU.cache, myCPU.mmu)
+	#A RAM checkpoint replaces the initial C, so verify against the C the loop starts from
+	c0 = [myCPU.cache.ram.data[c[i]//conf.block_size].data[(c[i]//conf.size_of_double)%doubles_per_block] for i in range(x*z)]
 	logging.on()
 	for i in range(x):
 		for j in range(z):
@@ -464,28 +1254,38 @@ def mxm():
 				Cij = myCPU.addDouble(Cij,tmp)
 			myCPU.setDouble(c[i * z + j],Cij)
 	logging.off()
+	end_simulation(myCPU.cache, myCPU.mmu)
 	#End Simulation
+	start_phase("verify")
 
 	#Double Checking Dot Result
 	for i in range(x):
 		for j in range(z):
-			Cij = i * z + j
+			Cij = c0[i * z + j]
 			for k in range(y):
 				Aik = myCPU.cache.ram.data[a[i * y + k]//conf.block_size].data[(a[i * y + k]//conf.size_of_double)%doubles_per_block]
 				Bkj = myCPU.cache.ram.data[b[k * z + j]//conf.block_size].data[(b[k * z + j]//conf.size_of_double)%doubles_per_block]
 				Cij += Aik * Bkj
 			if Cij != myCPU.cache.ram.data[c[i * z + j]//conf.block_size].data[(c[i * z + j]//conf.size_of_double)%doubles_per_block]:
 				raise Exception("Error, Result Doesn't Match")
+	stop_phase()
 			
 
-def mxm_block():
+def mxm_block(x = 100, y = 100, z = 100, mxm_block_size = None, tile = None, loop_order = "jik"):
 	#see the book for algorithm
+	#tile = (ti, tj, tk) allows rectangular tiles; loop_order orders the tile loops, outermost first.
+	#Edge tiles are cut at the matrix bounds, so sizes need not divide x, y, z
 
+	start_phase("startup")
 	myCPU = CPU()
-
-	x = y = z = 100
-
-	mxm_block_size = int(x / 10)
+	start_phase("setup")
+
+	if tile == None:
+		if mxm_block_size == None:
+			mxm_block_size = int(x / 10)
+		tile = (mxm_block_size, mxm_block_size, mxm_block_size)
+	ti, tj, tk = tile
+	tile_starts = {"i": range(0, x, ti), "j": range(0, z, tj), "k": range(0, y, tk)}
 	doubles_per_block = conf.block_size // conf.size_of_double
 	### Initialize Three Arrays With Address
 	a = [Address(i * 8) for i in range(x*y)] # x * y
@@ -501,55 +1301,90 @@ def mxm_block():
 		myCPU.cache.ram.data[c[i]//conf.block_size].data[(c[i]//conf.size_of_double)%doubles_per_block] = i
 
 	#Start Simulation
+	begin_simulation(myCPU.cache, myCPU.mmu)
+	#A RAM checkpoint replaces the initial C, so verify against the C the loop starts from
+	c0 = [myCPU.cache.ram.data[c[i]//conf.block_size].data[(c[i]//conf.size_of_double)%doubles_per_block] for i in range(x*z)]
 	logging.on()
-	for sj in range(0,z,mxm_block_size):
-		for si in range(0,x,mxm_block_size):
-			for sk in range(0,y,mxm_block_size):
-				for i in range(si,si+mxm_block_size):
-					for j in range(sj,sj+mxm_block_size):
-						Cij = myCPU.getDouble(c[i * z + j])
-						for k in range(sk,sk+mxm_block_size):
-							Aik = myCPU.getDouble(a[i * y + k])
-							Bkj = myCPU.getDouble(b[k * z + j])
-							tmp = myCPU.multDouble(Aik,Bkj)
-							Cij = myCPU.addDouble(Cij,tmp)
-						myCPU.setDouble(c[i * z + j],Cij)
+	for starts in itertools.product(*[tile_starts[loop] for loop in loop_order]):
+		start = dict(zip(loop_order, starts))
+		si, sj, sk = start["i"], start["j"], start["k"]
+		for i in range(si,min(si+ti,x)):
+			for j in range(sj,min(sj+tj,z)):
+				Cij = myCPU.getDouble(c[i * z + j])
+				for k in range(sk,min(sk+tk,y)):
+					Aik = myCPU.getDouble(a[i * y + k])
+					Bkj = myCPU.getDouble(b[k * z + j])
+					tmp = myCPU.multDouble(Aik,Bkj)
+					Cij = myCPU.addDouble(Cij,tmp)
+				myCPU.setDouble(c[i * z + j],Cij)
 	logging.off()
+	end_simulation(myCPU.cache, myCPU.mmu)
+	start_phase("verify")
 
 	#Double Checking Dot Result
 	for i in range(x):
 		for j in range(z):
-			Cij = i * z + j
+			Cij = c0[i * z + j]
 			for k in range(y):
 				Aik = myCPU.cache.ram.data[a[i * y + k]//conf.block_size].data[(a[i * y + k]//conf.size_of_double)%doubles_per_block]
 				Bkj = myCPU.cache.ram.data[b[k * z + j]//conf.block_size].data[(b[k * z + j]//conf.size_of_double)%doubles_per_block]
 				Cij += Aik * Bkj
 			if Cij != myCPU.cache.ram.data[c[i * z + j]//conf.block_size].data[(c[i * z + j]//conf.size_of_double)%doubles_per_block]:
 				raise Exception("Error, Result Doesn't Match")
+	stop_phase()
 			
 
 
 def main(args):
-	global conf,logging
+	global conf,logging,timer,profile,checkpoint
 
 	np.random.seed(0) #For repetibility 
 
-	conf = Configuration(args.cache_size, args.block_size, args.associativity, args.replacement, args.algorithm)
+	conf = configuration_from_args(args)
 	logging = Logging()
+	timer = Timer()
+	if conf.timing:
+		logging.register("cycles")
+	checkpoint = {"load": args.load_state, "save": args.save_state, "ram": args.save_ram}
+	profile = AccessProfile() if args.profile or args.profiler != None else None
+
+	if args.profiler != None:
+		import CacheProfiler
+		timer.profiler = CacheProfiler.make_profiler(args.profiler)
 
 	print("Running Configuration:\n{}".format(conf))
 
-	if conf.algorithm == "mxm":
+	if args.engine == "fast" and (conf.page_size != None or conf.sector_size != None or conf.mshrs != None or conf.tenants > 1 or conf.algorithm == "dot_vector"):
+		raise Exception("Virtual memory, sectored lines, MSHRs, tenants and dot_vector need the reference engine (-e python)")
+
+	params = dict(WORKLOAD_PARAMS[conf.algorithm])
+	if conf.algorithm in ["mxm_block", "colocate"]:
+		params.update(tile = conf.tile, loop_order = conf.loop_order)
+
+	if args.engine == "fast":
+		#Compiled engine: same counters, cache metadata only (no data values, no result check)
+		import FastCache
+		FastCache.simulate(conf, logging, timer, params, begin_simulation, end_simulation)
 
-		mxm()
+	elif conf.algorithm == "mxm":
+
+		mxm(**params)
 
 	elif conf.algorithm == "dot":
 
-		dot()
+		dot(**params)
 
 	elif conf.algorithm == "mxm_block":
 
-		mxm_block()
+		mxm_block(**params)
+
+	elif conf.algorithm == "dot_vector":
+
+		dot_vector(**params)
+
+	elif conf.algorithm == "colocate":
+
+		colocate(**params)
 
 	else:
 		raise Exception("Unknown Conf.algorithm: {}".format(conf.algorithm))
@@ -559,23 +1394,52 @@ def main(args):
 	print()
 	print()
 
+	if profile != None:
+		import CacheProfiler
+		CacheProfiler.report(timer, profile, logging, args.profile_output)
+
+	if args.results != None:
+		import ResultTable
+		ResultTable.append(args.results, ResultTable.record(conf, logging, args.engine))
+
 	return logging
 
-if __name__ == "__main__":
-	
-	parser = argparse.ArgumentParser(description='Python Argument Parser')
+parser = argparse.ArgumentParser(description='Python Argument Parser')
+
+parser.add_argument("-c","--cache-size",help = "The size of the cache in bytes", default = 65536, type = int)
+parser.add_argument("-b","--block-size",help = "The size of a data block in bytes", default = 64, type = int)
+parser.add_argument("-n","--associativity",help = "The n-way associativity of the cache", default = 2, type = int)
+parser.add_argument("-r","--replacement",help = "The replacement policy", default = "LRU", choices=['LRU', 'FIFO', 'random'])
+parser.add_argument("-a","--algorithm",help = "The algorithm to simulate", default = "mxm", choices=['dot', 'mxm', 'mxm_block', 'dot_vector', 'colocate'])
+parser.add_argument("-e","--engine",help = "Reference Python model or compiled fast path", default = "python", choices=['python', 'fast'])
+parser.add_argument("--sector-size",help = "Split each block into sectors of this many bytes with their own valid bits", default = None, type = int)
+parser.add_argument("--vector-width",help = "Bytes per load in dot_vector (8-64)", default = 32, type = int)
+parser.add_argument("--offset",help = "Byte offset of the dot_vector arrays; non-multiples of the width make loads unaligned", default = 0, type = int)
+parser.add_argument("--tile",help = "mxm_block tile as rows,columns,depth (i,j,k), e.g. 16,32,8 (default: square x/10)", default = None)
+parser.add_argument("--loop-order",help = "Order of the mxm_block tile loops, outermost first", default = "jik", choices=["ijk", "ikj", "jik", "jki", "kij", "kji"])
+parser.add_argument("--tenants",help = "Number of tenants sharing the cache (colocate uses 2)", default = 1, type = int)
+parser.add_argument("--way-masks",help = "CAT-style fill mask per tenant, e.g. 0x3,0xc (default: all ways shared)", default = None)
+parser.add_argument("--partitioner",help = "Re-divide ways between tenants from shadow-tag utility monitors", default = None, choices=['ucp'])
+parser.add_argument("--repartition-interval",help = "Accesses between utility-based repartitions", default = 5000, type = int)
+parser.add_argument("--umon-sets",help = "Sets sampled by each tenant's utility monitor", default = 16, type = int)
+parser.add_argument("--page-size",help = "Enable virtual memory with this page size, e.g. 4K or 2M", default = None)
+parser.add_argument("--tlb",help = "TLB levels as entries:ways, L1 first", default = "64:4,1536:12")
+parser.add_argument("--tlb-latency",help = "Lookup cycles per TLB level", default = "0,7")
+parser.add_argument("--tlb-replacement",help = "The TLB replacement policy", default = "LRU", choices=['LRU', 'FIFO', 'random'])
+parser.add_argument("--walk-latency",help = "Cycles per page table level on a page walk", default = 25, type = int)
+parser.add_argument("--mshrs",help = "Non-blocking cache with this many MSHRs (default: blocking)", default = None, type = int)
+parser.add_argument("--hit-latency",help = "Cycles for a cache hit (timing model)", default = 4, type = int)
+parser.add_argument("--miss-latency",help = "Cycles for a cache miss (timing model)", default = 100, type = int)
+parser.add_argument("--profile",help = "Time each phase and break down time per access", action = "store_true")
+parser.add_argument("--profiler",help = "Profiler to run around the simulate phase (implies --profile)", default = None, choices=['cprofile', 'sample'])
+parser.add_argument("--load-state",help = "Restore cache state from a checkpoint before simulating (warm start)", default = None)
+parser.add_argument("--save-state",help = "Save cache state to a checkpoint after simulating", default = None)
+parser.add_argument("--save-ram",help = "Include RAM contents in --save-state (reference engine only)", action = "store_true")
+parser.add_argument("--results",help = "Append this run's configuration and counters to a columnar store (.csv file or .parquet dataset directory)", default = None)
+parser.add_argument("--profile-output",help = "Write cProfile stats (.prof) or sampled stacks to this file", default = None)
 
-	parser.add_argument("-c","--cache-size",help = "The size of the cache in bytes", default = 65536, type = int)
-	parser.add_argument("-b","--block-size",help = "The size of a data block in bytes", default = 64, type = int)
-	parser.add_argument("-n","--associativity",help = "The n-way associativity of the cache", default = 2, type = int)
-	parser.add_argument("-r","--replacement",help = "The replacement policy", default = "LRU", choices=['LRU', 'FIFO', 'random'])
-	parser.add_argument("-a","--algorithm",help = "The algorithm to simulate", default = "mxm", choices=['dot', 'mxm', 'mxm_block'])
+if __name__ == "__main__":
 	
 	args = parser.parse_args()
 
 	main(args)
-	
-
-
-
-
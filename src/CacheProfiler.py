@@ -0,0 +1,106 @@
+"""
+Cache Emulator Profiling
+Class: Computer Architecture
+
+Profilers that CacheEmulator.main() runs around the simulate phase
+(--profiler cprofile|sample), and the --profile report: wall time per phase
+plus time per access split into lookup, fill and eviction.
+"""
+
+import cProfile
+import pstats
+import signal
+import sys
+from collections import Counter
+
+
+class SamplingProfiler():
+	#Statistical profiler: a SIGPROF timer samples the Python stack every `interval` seconds of CPU time
+	def __init__(self, interval = 0.001):
+
+		if not hasattr(signal, "setitimer"):
+			raise Exception("Sampling profiler needs signal.setitimer (Unix only)")
+
+		self.interval = interval
+		self.own = Counter() #Samples where the function is on top of the stack
+		self.total = Counter() #Samples where the function is anywhere on the stack
+		self.samples = 0
+		self.previous_handler = None
+
+	def sample(self, signum, frame):
+		self.samples += 1
+		seen = set()
+		top = True
+		while frame != None:
+			key = "{}:{}".format(frame.f_code.co_filename.split("/")[-1], frame.f_code.co_name)
+			if top:
+				self.own[key] += 1
+				top = False
+			if key not in seen:
+				self.total[key] += 1
+				seen.add(key)
+			frame = frame.f_back
+
+	def enable(self):
+		self.previous_handler = signal.signal(signal.SIGPROF, self.sample)
+		signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+	def disable(self):
+		signal.setitimer(signal.ITIMER_PROF, 0, 0)
+		signal.signal(signal.SIGPROF, self.previous_handler)
+
+	def print_stats(self, limit = 20, stream = sys.stdout):
+		stream.write("{} samples every {}s\n".format(self.samples, self.interval))
+		stream.write("{:>8} {:>8}  {}\n".format("own%", "total%", "function"))
+		for key, own in self.own.most_common(limit):
+			stream.write("{:>8.1f} {:>8.1f}  {}\n".format(100.0 * own / self.samples, 100.0 * self.total[key] / self.samples, key))
+
+
+def make_profiler(kind):
+	if kind == "cprofile":
+		return cProfile.Profile()
+	elif kind == "sample":
+		return SamplingProfiler()
+	else:
+		raise Exception("Unknown profiler {}".format(kind))
+
+
+def report(timer, profile, logging, output = None):
+	#Print phase times, the per-access breakdown and, if one ran, the profiler's top functions
+	accesses = logging.read_hits + logging.read_misses + logging.write_hits + logging.write_misses
+
+	print("Phase Times:")
+	for phase, seconds in timer.phases.items():
+		print("\t{}:\t{:.6f}s".format(phase, seconds))
+
+	if profile.counts["lookup"] > 0:
+		#Fill time is measured around load_block_from_ram, which includes choose_victim
+		breakdown = [
+			("lookup", profile.seconds["lookup"], profile.counts["lookup"]),
+			("fill", profile.seconds["fill"] - profile.seconds["eviction"], profile.counts["fill"]),
+			("eviction", profile.seconds["eviction"], profile.counts["eviction"]),
+		]
+
+		print("Time Per Access ({} accesses):".format(accesses))
+		for category, seconds, count in breakdown:
+			print("\t{}:\t{:.1f}ns/access\t{:.1f}ns/event\t{} events".format(
+				category, 1e9 * seconds / max(accesses, 1), 1e9 * seconds / max(count, 1), count))
+
+		if "simulate" in timer.phases:
+			other = timer.phases["simulate"] - profile.seconds["lookup"] - profile.seconds["fill"]
+			print("\tother:\t{:.1f}ns/access".format(1e9 * other / max(accesses, 1)))
+
+	profiler = timer.profiler
+	if profiler == None:
+		return
+
+	print("Simulate Phase Profile:")
+	if isinstance(profiler, SamplingProfiler):
+		profiler.print_stats()
+		if output != None:
+			with open(output, "w") as f:
+				profiler.print_stats(limit = None, stream = f)
+	else:
+		pstats.Stats(profiler).sort_stats("tottime").print_stats(20)
+		if output != None:
+			profiler.dump_stats(output)
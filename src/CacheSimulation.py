@@ -1,18 +1,46 @@
 import argparse
 import matplotlib.pyplot as plt
 import numpy as np
-from CacheEmulator import main
+import ResultTable
+from CacheEmulator import SIMULATOR_VERSION, main, parser, configuration_from_args
+from ResultCache import ResultCache, cached_main
+
+sweep_parser = argparse.ArgumentParser(description='Cache Simulation Sweeps')
+sweep_parser.add_argument("--no-cache",help = "Always re-simulate, never read or write the result cache", action = "store_true")
+sweep_parser.add_argument("--clear-cache",help = "Drop all cached results before sweeping", action = "store_true")
+sweep_parser.add_argument("--cache-dir",help = "Result cache directory", default = None)
+sweep_parser.add_argument("--results",help = "Columnar results every run is appended to (.csv file or .parquet dataset directory)", default = "./results/sweep.csv")
+sweep_parser.add_argument("--plot-only",help = "Redraw the graphs from --results without simulating", action = "store_true")
+
+result_cache = None #Set in __main__ unless --no-cache
+
+#Each sweep varies one parameter and becomes one graph
+SWEEPS = []
+for algorithm in ["dot", "mxm", "mxm_block"]:
+	#Fixed Cache Size: 1024, Block Size: 64
+	SWEEPS.append([["-c=1024","-n={}".format(n),"-a={}".format(algorithm)] for n in [1, 2, 4, 8]]) #Different Associativity
+	SWEEPS.append([["-c=1024","-r={}".format(r),"-a={}".format(algorithm)] for r in ["LRU", "random", "FIFO"]]) #Different Replacement Policy
+	SWEEPS.append([["-c=1024","-b={}".format(b),"-a={}".format(algorithm)] for b in ([8, 16, 64, 128] if algorithm == "dot" else [8, 16, 64, 256])]) #Different Block Size
+	SWEEPS.append([["-c={}".format(c),"-a={}".format(algorithm)] for c in [256, 512, 1024, 2048]]) #Different Cache Size
 
-parser = argparse.ArgumentParser(description='Python Argument Parser')
-parser.add_argument("-c","--cache-size",help = "The size of the cache in bytes", default = 65536, type = int)
-parser.add_argument("-b","--block-size",help = "The size of a data block in bytes", default = 64, type = int)
-parser.add_argument("-n","--associativity",help = "The n-way associativity of the cache", default = 2, type = int)
-parser.add_argument("-r","--replacement",help = "The replacement policy", default = "LRU", choices=['LRU', 'FIFO', 'random'])
-parser.add_argument("-a","--algorithm",help = "The algorithm to simulate", default = "mxm", choices=['dot', 'mxm', 'mxm_block'])
+def run(args, results):
+	#Both main() and cached_main() append the run to args.results
+	args.results = results
+	if result_cache == None:
+		return main(args)
+	return cached_main(args, result_cache)
 
 
 
-def generate_graph(data, arg_arr):
+def generate_graph(columns, arg_arr):
+	#Plot the latest stored result of each configuration in arg_arr
+	data = []
+	for arg in arg_arr:
+		#Whole configuration, engine and simulator version, so other models' runs in the same file are not picked up
+		row = ResultTable.latest(columns, version = SIMULATOR_VERSION, engine = arg.engine, **ResultTable.fields(configuration_from_args(arg)))
+		if row == None:
+			raise Exception("No stored result for {}, run the sweep without --plot-only first".format(arg))
+		data.append(row)
 	
 	if arg_arr[0].cache_size != arg_arr[1].cache_size:
 		var_type = "c"
@@ -47,11 +75,11 @@ def generate_graph(data, arg_arr):
 	rects = []
 	for idx,ele in enumerate(data):
 		vals = []
-		vals.append(ele.instruction_cnt)
-		vals.append(ele.read_hits)
-		vals.append(ele.read_misses)
-		vals.append(ele.write_hits)
-		vals.append(ele.write_misses)
+		vals.append(ele["instruction_cnt"])
+		vals.append(ele["read_hits"])
+		vals.append(ele["read_misses"])
+		vals.append(ele["write_hits"])
+		vals.append(ele["write_misses"])
 		rects.append(ax.bar(ind + idx * width, vals, width, color=colors[idx]))
 
 	
@@ -79,289 +107,25 @@ def generate_graph(data, arg_arr):
 
 if __name__ == "__main__":
 
+	sweep_args = sweep_parser.parse_args()
+	if not sweep_args.no_cache:
+		result_cache = ResultCache() if sweep_args.cache_dir == None else ResultCache(sweep_args.cache_dir)
+		if sweep_args.clear_cache:
+			result_cache.invalidate()
 
-	
-	### Dot Algorithm
-	#Fixed Cache Size: 1024, Block Size: 64. 
-		
-	
-	#Different Associativity
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-n=1","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=2","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=4","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=8","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-
-
-	#Different Replacement Policy
-
-	data = []
-	arg_arr = []
-	args = parser.parse_args(["-c=1024","-r=LRU","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-r=random","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-r=FIFO","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-	
-	
-	#Different Block Size
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-b=8","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=16","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=64","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=128","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-
-	#Different Cache Size
-
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=256","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=512","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=2048","-a=dot"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-	
-
-	
-	### MXM Algorithm
-	#Fixed Cache Size: 1024, Block Size: 64
-
-	#Different associativity
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-n=1"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=2"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=4"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=8"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-
-	
-
-	#Different Replacement Policy
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-r=LRU"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-r=random"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-r=FIFO"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-
-
-	#Different Replacement Policy
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-b=8"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=16"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=64"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=256"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-	
-
-	#Different Replacement Policy
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=256"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=512"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=2048"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-	
-
-
-
-
-	### MXM_Blocks Algorithm
-	#Fixed Cache Size: 1024, Block Size: 64
-
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-n=1","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=2","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=4","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-n=8","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-
-	
-
-	#Different Replacement Policy
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-r=LRU","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-r=random","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-r=FIFO","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-
-
-	#Different Replacement Policy
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=1024","-b=8","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=16","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=64","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-b=256","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	generate_graph(data, arg_arr)
-	
-
-	#Different Replacement Policy
-	data = []
-	arg_arr = []
-
-	args = parser.parse_args(["-c=256","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=512","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=1024","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
-
-	args = parser.parse_args(["-c=2048","-a=mxm_block"])
-	arg_arr.append(args)
-	data.append(main(args))
+	for sweep in SWEEPS:
+		arg_arr = [parser.parse_args(argv) for argv in sweep]
 
-	generate_graph(data, arg_arr)
+		if not sweep_args.plot_only:
+			for args in arg_arr:
+				run(args, sweep_args.results)
 
+		generate_graph(ResultTable.load(sweep_args.results), arg_arr)
 
+	if result_cache != None:
+		print("Result cache: {} hits, {} misses".format(result_cache.hits, result_cache.misses))
 
 	#Debug
 	#main(parser.parse_args(["-c=32","-b=8","-n=2","-r=FIFO","-a=dot"]))
 
-	pass
\ No newline at end of file
+	pass
@@ -0,0 +1,246 @@
+"""
+Fast Cache Engine
+Class: Computer Architecture
+
+Keeps tags, valid bits and recency in typed NumPy arrays and runs the whole
+access loop in one compiled kernel (numba). Without numba the same kernel runs
+as plain Python, so counters are always identical to the reference model in
+CacheEmulator.py.
+"""
+
+import itertools
+
+import numpy as np
+
+try:
+	from numba import njit
+except ImportError:
+	njit = None
+
+#Counter slots filled by the kernel
+READ_HITS, READ_MISSES, WRITE_HITS, WRITE_MISSES = range(4)
+
+#Replacement policy codes used inside the kernel
+POLICY = {"LRU": 0, "FIFO": 1, "random": 2}
+
+
+def jit(func):
+	#Compile if numba is around, otherwise fall back to pure Python
+	if njit == None:
+		return func
+	return njit(cache = True, nogil = True)(func)
+
+
+@jit
+def access_kernel(addresses, writes, tags, valid, last_visited, last_loaded, dirty, block_size, num_of_sets, policy, rand_ways, rand_pos, clock, counters):
+	#Mirrors Cache.getDouble / setDouble / find_block_in_cache / load_block_from_ram
+	blocks_per_set = tags.shape[1]
+
+	for n in range(addresses.shape[0]):
+		address = addresses[n]
+		set_index = (address // block_size) % num_of_sets
+		tag = address // (block_size * num_of_sets)
+
+		#Lookup
+		hit_way = -1
+		for way in range(blocks_per_set):
+			if valid[set_index, way] and tags[set_index, way] == tag:
+				hit_way = way
+				break
+
+		clock += 1
+
+		if hit_way >= 0:
+			last_visited[set_index, hit_way] = clock
+			if writes[n]:
+				dirty[set_index, hit_way] = True
+				counters[WRITE_HITS] += 1
+			else:
+				counters[READ_HITS] += 1
+			continue
+
+		if writes[n]:
+			counters[WRITE_MISSES] += 1
+		else:
+			counters[READ_MISSES] += 1
+
+		#Fill: first invalid way, otherwise evict
+		victim = -1
+		for way in range(blocks_per_set):
+			if not valid[set_index, way]:
+				victim = way
+				valid[set_index, way] = True
+				break
+
+		if victim < 0:
+			if policy == 2:
+				victim = rand_ways[rand_pos]
+				rand_pos += 1
+			else:
+				#LRU and FIFO both pick the oldest last_visited_time, as the reference model does
+				victim = 0
+				for way in range(1, blocks_per_set):
+					if last_visited[set_index, way] < last_visited[set_index, victim]:
+						victim = way
+
+		tags[set_index, victim] = tag
+		last_visited[set_index, victim] = clock
+		last_loaded[set_index, victim] = clock
+		dirty[set_index, victim] = writes[n]
+
+	return clock, rand_pos
+
+
+class FastCache():
+	def __init__(self, conf):
+
+		if conf.replacement not in POLICY:
+			raise Exception("Unknown Replacement Type")
+
+		self.conf = conf
+		self.blocks_per_set = conf.associativity
+		self.num_of_sets = conf.num_of_sets
+		self.tags = np.zeros((self.num_of_sets, self.blocks_per_set), dtype=np.int64)
+		self.valid = np.zeros((self.num_of_sets, self.blocks_per_set), dtype=np.bool_)
+		self.last_visited = np.zeros((self.num_of_sets, self.blocks_per_set), dtype=np.int64)
+		self.last_loaded = np.zeros((self.num_of_sets, self.blocks_per_set), dtype=np.int64)
+		self.dirty = np.zeros((self.num_of_sets, self.blocks_per_set), dtype=np.bool_)
+		self.policy = POLICY[conf.replacement]
+		self.counters = np.zeros(4, dtype=np.int64)
+		self.clock = 0
+
+		#Pre-drawn victims for random replacement, consumed in the same order as np.random.randint calls
+		self.rand_ways = np.zeros(0, dtype=np.int64)
+		self.rand_pos = 0
+		#Source of those draws; a RandomState gives this cache its own stream
+		self.rng = np.random
+
+		#Empty batch so JIT compilation is paid at construction, not in the first real batch
+		self.access(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.bool_))
+
+	def access(self, addresses, writes):
+		#Simulate a batch of byte addresses; writes is a bool array of the same length
+		addresses = np.ascontiguousarray(addresses, dtype=np.int64)
+		writes = np.ascontiguousarray(writes, dtype=np.bool_)
+
+		if self.policy == POLICY["random"] and len(self.rand_ways) - self.rand_pos < len(addresses):
+			#Worst case every access evicts. Extra draws are only ever used by later batches.
+			draws = self.rng.randint(self.blocks_per_set, size=len(addresses)).astype(np.int64)
+			self.rand_ways = np.concatenate((self.rand_ways[self.rand_pos:], draws))
+			self.rand_pos = 0
+
+		self.clock, self.rand_pos = access_kernel(addresses, writes, self.tags, self.valid, self.last_visited, self.last_loaded, self.dirty,
+			self.conf.block_size, self.num_of_sets, self.policy, self.rand_ways, self.rand_pos, self.clock, self.counters)
+
+	def __repr__(self):
+		#For debug
+		return "FastCache Status:\n{}\n{}\n".format(self.valid, self.tags)
+
+
+def dot_trace(n = 20000):
+	#Same access order as dot(): a[i], b[i] for every i, then store c
+	addresses = np.empty(2 * n + 1, dtype=np.int64)
+	addresses[0:2 * n:2] = np.arange(0, n) * 8
+	addresses[1:2 * n:2] = np.arange(n, 2 * n) * 8
+	addresses[-1] = 2 * n * 8
+
+	writes = np.zeros(2 * n + 1, dtype=np.bool_)
+	writes[-1] = True
+
+	# 2 loads + mult + add per element, plus the final store
+	return addresses, writes, 2 * n
+
+
+def tile_trace(x, y, z, i_range, j_range, k_range):
+	#Accesses of C[i,j] += sum_k A[i,k] * B[k,j] for one tile, i outer, j middle, k inner
+	i = np.arange(*i_range).reshape(-1, 1, 1)
+	j = np.arange(*j_range).reshape(1, -1, 1)
+	k = np.arange(*k_range).reshape(1, 1, -1)
+	ni, nj, nk = i.shape[0], j.shape[1], k.shape[2]
+
+	trace = np.empty((ni, nj, 2 * nk + 2), dtype=np.int64)
+	trace[:, :, 0] = ((x * y + y * z) + i * z + j)[:, :, 0]
+	trace[:, :, 1:2 * nk + 1:2] = i * y + k
+	trace[:, :, 2:2 * nk + 2:2] = x * y + k * z + j
+	trace[:, :, -1] = trace[:, :, 0]
+
+	writes = np.zeros((ni, nj, 2 * nk + 2), dtype=np.bool_)
+	writes[:, :, -1] = True
+
+	return (trace * 8).ravel(), writes.ravel(), 2 * ni * nj * nk
+
+
+def mxm_trace(x = 100, y = 100, z = 100):
+	#Same access order as mxm()
+	return tile_trace(x, y, z, (0, x), (0, z), (0, y))
+
+
+def mxm_block_chunks(x = 100, y = 100, z = 100, mxm_block_size = None, tile = None, loop_order = "jik"):
+	#Same access order as mxm_block(), yielded as (addresses, writes, ops) per step of the outermost tile loop
+	if tile == None:
+		if mxm_block_size == None:
+			mxm_block_size = int(x / 10)
+		tile = (mxm_block_size, mxm_block_size, mxm_block_size)
+	ti, tj, tk = tile
+	tile_starts = {"i": range(0, x, ti), "j": range(0, z, tj), "k": range(0, y, tk)}
+
+	for outer in tile_starts[loop_order[0]]:
+		traces = []
+		write_flags = []
+		ops = 0
+		for starts in itertools.product([outer], *[tile_starts[loop] for loop in loop_order[1:]]):
+			start = dict(zip(loop_order, starts))
+			si, sj, sk = start["i"], start["j"], start["k"]
+			trace, trace_writes, trace_ops = tile_trace(x, y, z, (si, min(si + ti, x)), (sj, min(sj + tj, z)), (sk, min(sk + tk, y)))
+			traces.append(trace)
+			write_flags.append(trace_writes)
+			ops += trace_ops
+		yield np.concatenate(traces), np.concatenate(write_flags), ops
+
+
+def mxm_block_trace(x = 100, y = 100, z = 100, mxm_block_size = None, tile = None, loop_order = "jik"):
+	#Same access order as mxm_block(): tiles walked in loop_order (default sj, si, sk)
+	chunks = list(mxm_block_chunks(x, y, z, mxm_block_size, tile, loop_order))
+	return np.concatenate([chunk[0] for chunk in chunks]), np.concatenate([chunk[1] for chunk in chunks]), sum(chunk[2] for chunk in chunks)
+
+
+def build_trace(algorithm, params = {}):
+	#params are the keyword arguments of the matching CacheEmulator kernel
+	if algorithm == "dot":
+		return dot_trace(**params)
+	elif algorithm == "mxm":
+		return mxm_trace(**params)
+	elif algorithm == "mxm_block":
+		return mxm_block_trace(**params)
+	else:
+		raise Exception("Unknown Conf.algorithm: {}".format(algorithm))
+
+
+def simulate(conf, logging, timer, params = {}, begin_simulation = None, end_simulation = None):
+	#Run conf.algorithm on the fast engine and fill in logging like the reference kernels do.
+	#begin/end_simulation are CacheEmulator's hooks around the simulated loop (timing, checkpoints)
+	timer.start("startup")
+	cache = FastCache(conf)
+
+	timer.start("setup")
+	addresses, writes, ops = build_trace(conf.algorithm, params)
+
+	if begin_simulation != None:
+		begin_simulation(cache)
+	else:
+		timer.start("simulate")
+
+	cache.access(addresses, writes)
+
+	logging.instruction_cnt += len(addresses) + ops
+	logging.read_hits += int(cache.counters[READ_HITS])
+	logging.read_misses += int(cache.counters[READ_MISSES])
+	logging.write_hits += int(cache.counters[WRITE_HITS])
+	logging.write_misses += int(cache.counters[WRITE_MISSES])
+
+	if end_simulation != None:
+		end_simulation(cache)
+	else:
+		timer.stop()
+
+	return cache
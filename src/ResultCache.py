@@ -0,0 +1,144 @@
+"""
+Sweep Result Cache
+Class: Computer Architecture
+
+On-disk store of simulation counters keyed by a hash of the Configuration
+fields, the workload parameters and CacheEmulator.SIMULATOR_VERSION. Both
+engines produce identical counters, so the engine is not part of the key.
+Runs are seeded, so a stored result is exactly what a re-run would print.
+
+	python ResultCache.py --list
+	python ResultCache.py --clear [-a dot] [-c 1024] ...
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import CacheEmulator
+from CacheEmulator import Logging, configuration_from_args
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache")
+
+
+class ResultCache():
+	def __init__(self, path = DEFAULT_PATH):
+
+		self.path = path
+		self.hits = 0
+		self.misses = 0
+
+		if not os.path.isdir(self.path):
+			os.makedirs(self.path)
+
+	def describe(self, conf):
+		#Everything that determines the counters of a run
+		return {
+			"configuration": conf.__dict__,
+			"workload": CacheEmulator.WORKLOAD_PARAMS[conf.algorithm],
+			"version": CacheEmulator.SIMULATOR_VERSION,
+		}
+
+	def key(self, conf):
+		return hashlib.sha256(json.dumps(self.describe(conf), sort_keys = True).encode()).hexdigest()
+
+	def file_of(self, key):
+		return os.path.join(self.path, key + ".json")
+
+	def get(self, conf):
+		#Return a Logging with the stored counters, or None
+		try:
+			with open(self.file_of(self.key(conf))) as f:
+				entry = json.load(f)
+		except (OSError, ValueError):
+			self.misses += 1
+			return None
+
+		self.hits += 1
+		log = Logging()
+		for counter, value in entry["counters"].items():
+			setattr(log, counter, value)
+		return log
+
+	def put(self, conf, log):
+		entry = self.describe(conf)
+		entry["counters"] = {counter: value for counter, value in log.__dict__.items() if counter != "log_flag"}
+
+		#Write then rename so an interrupted sweep never leaves a half-written entry
+		key = self.key(conf)
+		tmp_file = self.file_of(key) + ".tmp"
+		with open(tmp_file, "w") as f:
+			json.dump(entry, f, indent = 1, sort_keys = True)
+		os.replace(tmp_file, self.file_of(key))
+
+	def entries(self):
+		for file_name in sorted(os.listdir(self.path)):
+			if file_name.endswith(".json"):
+				with open(os.path.join(self.path, file_name)) as f:
+					yield file_name[:-len(".json")], json.load(f)
+
+	def invalidate(self, **match):
+		#Remove entries whose configuration matches every given field (all entries if none given).
+		#Entries from other simulator versions are always removed since they can never be hit again.
+		removed = 0
+		for key, entry in list(self.entries()):
+			stale = entry["version"] != CacheEmulator.SIMULATOR_VERSION
+			if stale or all(entry["configuration"].get(field) == value for field, value in match.items()):
+				os.remove(self.file_of(key))
+				removed += 1
+		return removed
+
+
+def cached_main(args, cache):
+	#Drop-in for CacheEmulator.main() that serves repeated configurations from cache
+	if args.load_state != None or args.save_state != None:
+		#A warm start is not part of the key, and a hit would not write the checkpoint
+		return CacheEmulator.main(args)
+	if args.profile or args.profiler != None:
+		#A hit has counters but no phase times or profile to report
+		return CacheEmulator.main(args)
+
+	conf = configuration_from_args(args)
+
+	log = cache.get(conf)
+	if log != None:
+		print("Cached Configuration:\n{}".format(conf))
+		print(log)
+		print()
+		print()
+	else:
+		#--results is appended below for hits and misses alike, not by main()
+		log = CacheEmulator.main(argparse.Namespace(**dict(vars(args), results = None)))
+		cache.put(conf, log)
+
+	if args.results != None:
+		import ResultTable
+		ResultTable.append(args.results, ResultTable.record(conf, log, args.engine))
+	return log
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description='Sweep Result Cache')
+	parser.add_argument("--path",help = "Cache directory", default = DEFAULT_PATH)
+	parser.add_argument("--list",help = "List cached results", action = "store_true")
+	parser.add_argument("--clear",help = "Remove cached results matching the filters below (all if none)", action = "store_true")
+	parser.add_argument("-c","--cache-size",help = "Only entries with this cache size", type = int)
+	parser.add_argument("-b","--block-size",help = "Only entries with this block size", type = int)
+	parser.add_argument("-n","--associativity",help = "Only entries with this associativity", type = int)
+	parser.add_argument("-r","--replacement",help = "Only entries with this replacement policy")
+	parser.add_argument("-a","--algorithm",help = "Only entries with this algorithm")
+	cache_args = parser.parse_args()
+
+	cache = ResultCache(cache_args.path)
+	match = {field: getattr(cache_args, field) for field in ["cache_size", "block_size", "associativity", "replacement", "algorithm"] if getattr(cache_args, field) != None}
+
+	if cache_args.clear:
+		print("Removed {} cached results".format(cache.invalidate(**match)))
+
+	if cache_args.list:
+		for key, entry in cache.entries():
+			conf = entry["configuration"]
+			print("{}\tv{}\t{} c={} b={} n={} r={}\t{}".format(key[:12], entry["version"], conf["algorithm"], conf["cache_size"],
+				conf["block_size"], conf["associativity"], conf["replacement"], entry["counters"]))
@@ -0,0 +1,174 @@
+"""
+Columnar Results
+Class: Computer Architecture
+
+One record per run (configuration + every Logging counter) appended to a
+columnar store. The format follows the extension: a .csv file, or a .parquet
+dataset directory with one part file per append (needs pyarrow). Appending
+never rewrites earlier runs. load() gives back a dict of NumPy columns, so
+sweeps can be filtered and aggregated with array masks instead of re-parsing
+stdout.
+"""
+
+import csv
+import os
+from time import strftime, time_ns
+
+import numpy as np
+
+import CacheEmulator
+
+
+def fields(conf):
+	#Configuration as stored: list fields (TLB levels) flattened to text and unset ones (None) to empty, so every column is a plain array
+	return {field: "" if value == None else str(value) if isinstance(value, list) else value for field, value in conf.__dict__.items()}
+
+
+def record(conf, log, engine):
+	row = {"timestamp": strftime("%Y-%m-%dT%H:%M:%S"), "version": CacheEmulator.SIMULATOR_VERSION, "engine": engine}
+	row.update(fields(conf))
+	row.update({counter: value for counter, value in log.__dict__.items() if counter != "log_flag"})
+	return row
+
+
+def to_column(values):
+	#Typed array for a column; strings read back from CSV become int, float (empty -> NaN) or str
+	if not all(isinstance(value, str) for value in values):
+		return np.array(values)
+
+	try:
+		return np.array(values, dtype=np.int64)
+	except ValueError:
+		pass
+	try:
+		return np.array([value if value != "" else "nan" for value in values], dtype=np.float64)
+	except ValueError:
+		return np.array(values, dtype=str)
+
+
+def merge(columns, rows):
+	#Append rows to columns; columns missing on either side are filled with "" (str) or NaN (numbers)
+	old_length = len(next(iter(columns.values()))) if columns else 0
+	names = list(columns.keys()) + [name for name in rows[0].keys() if name not in columns]
+
+	merged = {}
+	for name in names:
+		new = to_column([row.get(name, np.nan) for row in rows])
+		old = columns.get(name)
+		if old_length == 0:
+			merged[name] = new
+			continue
+		if old is None:
+			old = np.full(old_length, np.nan) if new.dtype.kind in "if" else np.full(old_length, "", dtype=str)
+		if old.dtype.kind != new.dtype.kind and "U" in (old.dtype.kind, new.dtype.kind):
+			old, new = old.astype(str), new.astype(str)
+		merged[name] = np.concatenate((old, new))
+	return merged
+
+
+def load(path):
+	#Return {column name: np.ndarray}
+	if not os.path.exists(path):
+		return {}
+
+	if path.endswith(".csv"):
+		with open(path, newline = "") as f:
+			rows = list(csv.DictReader(f))
+		if not rows:
+			return {}
+		return {name: to_column([row[name] for row in rows]) for name in rows[0].keys()}
+
+	elif path.endswith(".parquet"):
+		try:
+			import pyarrow.parquet as pq
+		except ImportError:
+			raise Exception("Parquet results need pyarrow")
+
+		#Parts may differ in columns (runs with optional models), so merge them like appended rows
+		columns = {}
+		for part in parquet_parts(path):
+			columns = merge(columns, pq.read_table(part).to_pylist())
+		return columns
+
+	else:
+		raise Exception("Unknown results format {} (use .csv or .parquet)".format(path))
+
+
+def parquet_parts(path):
+	return [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".parquet")]
+
+
+def append(path, rows):
+	#Append one record (dict) or a list of records
+	if isinstance(rows, dict):
+		rows = [rows]
+
+	directory = os.path.dirname(path)
+	if directory and not os.path.isdir(directory):
+		os.makedirs(directory)
+
+	if path.endswith(".csv"):
+		#CSV appends in place as long as no new columns show up
+		columns = []
+		if os.path.exists(path):
+			with open(path, newline = "") as f:
+				columns = next(csv.reader(f), [])
+
+		if columns and all(name in columns for name in rows[0].keys()):
+			with open(path, "a", newline = "") as f:
+				csv.DictWriter(f, fieldnames = columns, restval = "").writerows(rows)
+			return
+
+		merged = merge(load(path), rows)
+		with open(path, "w", newline = "") as f:
+			writer = csv.writer(f)
+			writer.writerow(merged.keys())
+			writer.writerows(zip(*[column.tolist() for column in merged.values()]))
+
+	elif path.endswith(".parquet"):
+		try:
+			import pyarrow
+			import pyarrow.parquet as pq
+		except ImportError:
+			raise Exception("Parquet results need pyarrow")
+
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+		#New rows only; part names sort in append order
+		part = os.path.join(path, "part-{:020d}-{}.parquet".format(time_ns(), os.getpid()))
+		pq.write_table(pyarrow.table(merge({}, rows)), part)
+
+	else:
+		raise Exception("Unknown results format {} (use .csv or .parquet)".format(path))
+
+
+def matches(column, value):
+	#Rows of column equal to value. Text and bool values compare as text, since CSV gives "False", 2 for "2", NaN for "".
+	#An unset value ("") matches empty and NaN cells
+	if isinstance(value, (str, bool)) or column.dtype.kind not in "iuf":
+		text = column.astype(str)
+		if value == "":
+			return (text == "") | (text == "nan")
+		return text == str(value)
+	return column == value
+
+
+def select(columns, **match):
+	#Boolean mask of rows whose columns equal every given value; a column no row has matches only ""
+	length = len(next(iter(columns.values()))) if columns else 0
+	mask = np.ones(length, dtype=np.bool_)
+	for name, value in match.items():
+		if name in columns:
+			mask &= matches(columns[name], value)
+		elif value != "":
+			mask[:] = False
+	return mask
+
+
+def latest(columns, **match):
+	#The most recently appended row matching, as a dict, or None
+	rows = np.nonzero(select(columns, **match))[0]
+	if len(rows) == 0:
+		return None
+	return {name: column[rows[-1]] for name, column in columns.items()}
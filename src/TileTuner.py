@@ -0,0 +1,235 @@
+"""
+Tile Size Autotuner
+Class: Computer Architecture
+
+Searches mxm_block tilings (rectangular tiles and the order of the tile
+loops) for each cache configuration on the fast engine, and reports the one
+with the fewest misses or cycles. Candidates are simulated one step of the
+outermost tile loop at a time and dropped as soon as they are no better
+than the best so far.
+
+	python TileTuner.py -c 1024 4096 16384 -b 64 -n 2 [--objective cycles] [--output tiles.json]
+"""
+
+import argparse
+import itertools
+import json
+from time import perf_counter
+
+import numpy as np
+
+import CacheEmulator
+import FastCache
+from CacheEmulator import Configuration
+
+LOOP_ORDERS = ["".join(order) for order in itertools.permutations("ijk")]
+
+
+def misses(conf, counters, ops):
+	return int(counters[FastCache.READ_MISSES] + counters[FastCache.WRITE_MISSES])
+
+
+def cycles(conf, counters, ops):
+	#Blocking timing model of the reference engine: latency per access plus one cycle per add/mult
+	hits = int(counters[FastCache.READ_HITS] + counters[FastCache.WRITE_HITS])
+	return hits * conf.hit_latency + misses(conf, counters, ops) * conf.miss_latency + ops
+
+
+OBJECTIVES = {"misses": misses, "cycles": cycles}
+
+
+def tile_sizes(n, smallest = 2):
+	#Candidate extents along one dimension: powers of two and divisors of n, and n itself (untiled)
+	sizes = set([n])
+	size = smallest
+	while size < n:
+		sizes.add(size)
+		size *= 2
+	sizes.update(d for d in range(smallest, n) if n % d == 0)
+	return sorted(sizes)
+
+
+def footprint(tile):
+	#Bytes one tile touches: a ti*tk block of A, tk*tj of B and ti*tj of C
+	ti, tj, tk = tile
+	return (ti * tk + tk * tj + ti * tj) * 8
+
+
+class TileTuner():
+	def __init__(self, conf, shape = (100, 100, 100), objective = "misses", smallest = 2, beam = 3, prune = True):
+
+		if objective not in OBJECTIVES:
+			raise Exception("Unknown objective {}".format(objective))
+
+		self.conf = conf
+		self.shape = tuple(shape)
+		self.objective = objective
+		self.score_of = OBJECTIVES[objective]
+		self.beam = beam
+		self.prune = prune
+
+		x, y, z = self.shape
+		self.sizes = {"i": tile_sizes(x, smallest), "j": tile_sizes(z, smallest), "k": tile_sizes(y, smallest)}
+
+		self.best = None # (score, tile, loop_order)
+		self.baseline = None
+		self.scores = {} # effective candidate -> score, or None if terminated early
+		self.losers = [] # (effective order, tile) that overflow the cache and did not win
+		self.evaluated = 0
+		self.terminated = 0
+		self.pruned = 0
+		self.duplicates = 0
+
+	def effective(self, tile, loop_order):
+		#Clamp the tile to the matrix and drop loops that run once: their position in the order changes nothing
+		x, y, z = self.shape
+		tile = (min(tile[0], x), min(tile[1], z), min(tile[2], y))
+		steps = {"i": -(-x // tile[0]), "j": -(-z // tile[1]), "k": -(-y // tile[2])}
+		return tile, "".join(loop for loop in loop_order if steps[loop] > 1)
+
+	def dominated(self, tile, order):
+		#A tile that already overflows the cache only adds capacity misses as it grows, so anything
+		#at least as large as an overflowing loser with the same order is not worth simulating
+		if not self.prune or footprint(tile) <= self.conf.cache_size:
+			return False
+		return any(order == loser_order and all(a >= b for a, b in zip(tile, loser_tile)) for loser_order, loser_tile in self.losers)
+
+	def run(self, tile, loop_order, bound = None):
+		#Score of one tiling, or None once it reaches bound (early termination)
+		np.random.seed(0) #Same victims as CacheEmulator.main() for random replacement
+		cache = FastCache.FastCache(self.conf)
+		ops = 0
+		for addresses, writes, chunk_ops in FastCache.mxm_block_chunks(*self.shape, tile = tile, loop_order = loop_order):
+			cache.access(addresses, writes)
+			ops += chunk_ops
+			score = self.score_of(self.conf, cache.counters, ops)
+			if bound != None and score >= bound:
+				return None
+		return score
+
+	def evaluate(self, tile, loop_order):
+		#Simulate a candidate unless it is a duplicate or dominated; returns True if it became the best
+		tile, order = self.effective(tile, loop_order)
+		if (tile, order) in self.scores:
+			self.duplicates += 1
+			return False
+		if self.dominated(tile, order):
+			self.pruned += 1
+			return False
+
+		score = self.run(tile, loop_order, self.best[0] if self.best != None else None)
+		self.scores[(tile, order)] = score
+		self.evaluated += 1
+
+		if score == None:
+			self.terminated += 1
+			if footprint(tile) > self.conf.cache_size:
+				self.losers.append((order, tile))
+			return False
+
+		self.best = (score, tile, loop_order)
+		return True
+
+	def neighbours(self, tile, loop_order):
+		#Every tiling that differs in one tile extent or in the loop order
+		for dim, loop in enumerate("ijk"):
+			for size in self.sizes[loop]:
+				if size != tile[dim]:
+					yield tile[:dim] + (size,) + tile[dim + 1:], loop_order
+		for order in LOOP_ORDERS:
+			if order != loop_order:
+				yield tile, order
+
+	def tune(self):
+		x, y, z = self.shape
+
+		#The kernel's default tiling sets the first bound
+		default = max(int(x / 10), 1)
+		self.evaluate((default, default, default), "jik")
+		self.baseline = self.best[0]
+
+		#Coarse pass: square tiles in every loop order, keeping the best few as seeds
+		seeds = []
+		for size in sorted(set(self.sizes["i"]) | set(self.sizes["j"]) | set(self.sizes["k"])):
+			for loop_order in LOOP_ORDERS:
+				if self.evaluate((size, size, size), loop_order):
+					seeds.append(self.best[1:])
+
+		#Refinement: hill climb from the seeds through rectangular tiles and other orders
+		frontier = seeds[-self.beam:]
+		while frontier:
+			tile, loop_order = frontier.pop()
+			for candidate in self.neighbours(tile, loop_order):
+				if self.evaluate(*candidate):
+					frontier.append(self.best[1:])
+
+		return self.best
+
+	def summary(self):
+		score, tile, loop_order = self.best
+		return {
+			"cache_size": self.conf.cache_size,
+			"block_size": self.conf.block_size,
+			"associativity": self.conf.associativity,
+			"replacement": self.conf.replacement,
+			"shape": list(self.shape),
+			"objective": self.objective,
+			"tile": list(tile),
+			"loop_order": loop_order,
+			"footprint": footprint(tile),
+			"score": score,
+			"baseline": self.baseline,
+			"evaluated": self.evaluated,
+			"terminated": self.terminated,
+			"pruned": self.pruned,
+			"duplicates": self.duplicates,
+		}
+
+
+parser = argparse.ArgumentParser(description='mxm_block Tile Autotuner')
+parser.add_argument("-c","--cache-size",help = "Cache sizes in bytes to tune for", default = [65536], nargs = "+", type = int)
+parser.add_argument("-b","--block-size",help = "Block sizes in bytes", default = [64], nargs = "+", type = int)
+parser.add_argument("-n","--associativity",help = "Associativities", default = [2], nargs = "+", type = int)
+parser.add_argument("-r","--replacement",help = "Replacement policies", default = ["LRU"], nargs = "+", choices=['LRU', 'FIFO', 'random'])
+parser.add_argument("--shape",help = "Matrix shape x y z (A is x*y, B is y*z)", default = None, nargs = 3, type = int)
+parser.add_argument("--objective",help = "What to minimise", default = "misses", choices = list(OBJECTIVES))
+parser.add_argument("--hit-latency",help = "Cycles for a cache hit (cycles objective)", default = 4, type = int)
+parser.add_argument("--miss-latency",help = "Cycles for a cache miss (cycles objective)", default = 100, type = int)
+parser.add_argument("--min-tile",help = "Smallest tile extent to try", default = 2, type = int)
+parser.add_argument("--beam",help = "Coarse-pass winners to refine from", default = 3, type = int)
+parser.add_argument("--no-prune",help = "Simulate tiles that grow an overflowing loser too", action = "store_true")
+parser.add_argument("--output",help = "Write the best tiling per configuration to this JSON file", default = None)
+
+
+if __name__ == "__main__":
+
+	tune_args = parser.parse_args()
+
+	params = CacheEmulator.WORKLOAD_PARAMS["mxm_block"]
+	shape = tune_args.shape if tune_args.shape != None else (params["x"], params["y"], params["z"])
+
+	results = []
+	for cache_size, block_size, associativity, replacement in itertools.product(tune_args.cache_size, tune_args.block_size,
+		tune_args.associativity, tune_args.replacement):
+
+		conf = Configuration(cache_size, block_size, associativity, replacement, "mxm_block",
+			hit_latency = tune_args.hit_latency, miss_latency = tune_args.miss_latency)
+
+		start = perf_counter()
+		tuner = TileTuner(conf, shape, tune_args.objective, tune_args.min_tile, tune_args.beam, not tune_args.no_prune)
+		tuner.tune()
+		result = tuner.summary()
+		result["seconds"] = perf_counter() - start
+		results.append(result)
+
+		print("c={} b={} n={} r={}\ttile:{} order:{}\t{}:{} (default {}, {:.1f}%)\tevaluated:{} terminated:{} pruned:{}\t{:.1f}s".format(
+			cache_size, block_size, associativity, replacement, ",".join(str(t) for t in result["tile"]), result["loop_order"],
+			tune_args.objective, result["score"], result["baseline"], 100.0 * result["score"] / result["baseline"],
+			result["evaluated"], result["terminated"], result["pruned"], result["seconds"]))
+		print("\tpython CacheEmulator.py -a mxm_block -c {} -b {} -n {} -r {} --tile {} --loop-order {}".format(
+			cache_size, block_size, associativity, replacement, ",".join(str(t) for t in result["tile"]), result["loop_order"]))
+
+	if tune_args.output != None:
+		with open(tune_args.output, "w") as f:
+			json.dump(results, f, indent = 1)
+		print("Best tilings written to {}".format(tune_args.output))
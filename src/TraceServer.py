@@ -0,0 +1,248 @@
+"""
+Trace Ingest Server
+Class: Computer Architecture
+
+Local asyncio server that simulates live access streams from an external,
+instrumented process against one or more cache configurations on the fast
+engine. Listens on a Unix socket or on TCP at 127.0.0.1.
+
+Every frame is a 5 byte header, type (u8) and payload length (u32, little
+endian), followed by the payload:
+	RECORDS  (1)  packed records: address (u64) and op (u8, 0 read / 1 write)
+	SNAPSHOT (2)  empty request; answered with a SNAPSHOT frame of JSON counters
+	              covering every record sent before the request
+	ERROR    (3)  server to client, UTF-8 message; the connection is then closed
+
+Batches wait in a bounded queue. When it is full the server stops reading from
+the sockets, so producers are held back by the transport instead of the server
+buffering without limit.
+
+	python TraceServer.py --unix /tmp/cache.sock -c 1024 65536 -b 64 -n 2
+	python TraceServer.py --unix /tmp/cache.sock --replay mxm_block
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import struct
+
+import numpy as np
+
+import CacheEmulator
+import FastCache
+from CacheEmulator import Configuration
+
+HEADER = struct.Struct("<BI")
+RECORDS, SNAPSHOT, ERROR = 1, 2, 3
+
+#9 bytes per record, no padding
+RECORD = np.dtype([("address", "<u8"), ("op", "u1")])
+
+COUNTERS = [("read_hits", FastCache.READ_HITS), ("read_misses", FastCache.READ_MISSES),
+	("write_hits", FastCache.WRITE_HITS), ("write_misses", FastCache.WRITE_MISSES)]
+
+
+def encode(addresses, writes):
+	#One RECORDS frame for a batch of byte addresses and write flags
+	records = np.empty(len(addresses), dtype=RECORD)
+	records["address"] = addresses
+	records["op"] = writes
+	return HEADER.pack(RECORDS, records.nbytes) + records.tobytes()
+
+
+def decode(payload):
+	#RECORDS payload -> (int64 addresses, bool writes) as FastCache.access() takes them
+	if len(payload) % RECORD.itemsize != 0:
+		raise Exception("RECORDS payload of {} bytes is not a whole number of {} byte records".format(len(payload), RECORD.itemsize))
+
+	records = np.frombuffer(payload, dtype=RECORD)
+	if len(records) > 0 and records["address"].max() >= 1 << 63:
+		raise Exception("Addresses must be below 2^63")
+	if (records["op"] > 1).any():
+		raise Exception("Op must be 0 (read) or 1 (write)")
+
+	return records["address"].astype(np.int64), records["op"].astype(np.bool_)
+
+
+async def read_frame(reader, max_frame = None):
+	#(type, payload), or None if the peer closed between frames
+	try:
+		header = await reader.readexactly(HEADER.size)
+	except asyncio.IncompleteReadError as error:
+		if error.partial:
+			raise Exception("Connection closed inside a frame header")
+		return None
+
+	frame_type, length = HEADER.unpack(header)
+	if max_frame != None and length > max_frame:
+		raise Exception("Frame of {} bytes is over the {} byte limit".format(length, max_frame))
+
+	try:
+		return frame_type, await reader.readexactly(length)
+	except asyncio.IncompleteReadError:
+		raise Exception("Connection closed inside a frame payload")
+
+
+class TraceServer():
+	def __init__(self, confs, queue_size = 64, max_frame = 1 << 24):
+
+		self.caches = [FastCache.FastCache(conf) for conf in confs]
+		for cache in self.caches:
+			#Own stream per cache, seeded like CacheEmulator.main(), so random replacement matches a standalone run
+			cache.rng = np.random.RandomState(0)
+		#Holds record batches and snapshot requests (futures) in arrival order
+		self.queue = asyncio.Queue(queue_size)
+		self.max_frame = max_frame
+		self.records = 0
+		self.batches = 0
+		self.connections = 0
+
+	def simulate(self, addresses, writes):
+		#Runs in a worker thread; the kernel releases the GIL
+		for cache in self.caches:
+			cache.access(addresses, writes)
+
+	def snapshot(self):
+		return {
+			"records": self.records,
+			"batches": self.batches,
+			"queued": self.queue.qsize(),
+			"connections": self.connections,
+			"configurations": [dict({
+				"cache_size": cache.conf.cache_size,
+				"block_size": cache.conf.block_size,
+				"associativity": cache.conf.associativity,
+				"replacement": cache.conf.replacement,
+			}, **{counter: int(cache.counters[slot]) for counter, slot in COUNTERS}) for cache in self.caches],
+		}
+
+	async def consume(self):
+		#Single consumer, so batches from all connections reach the caches in queue order
+		loop = asyncio.get_running_loop()
+		while True:
+			item = await self.queue.get()
+			if isinstance(item, asyncio.Future):
+				if not item.done():
+					item.set_result(self.snapshot())
+			else:
+				await loop.run_in_executor(None, self.simulate, *item)
+				self.records += len(item[0])
+				self.batches += 1
+			self.queue.task_done()
+
+	async def handle(self, reader, writer):
+		self.connections += 1
+		try:
+			while True:
+				frame = await read_frame(reader, self.max_frame)
+				if frame == None:
+					break
+				frame_type, payload = frame
+
+				if frame_type == RECORDS:
+					#Blocks while the queue is full, which stops this connection from being read
+					await self.queue.put(decode(payload))
+
+				elif frame_type == SNAPSHOT:
+					#Queued behind the batches already received so the counters include them
+					reply = asyncio.get_running_loop().create_future()
+					await self.queue.put(reply)
+					message = json.dumps(await reply).encode()
+					writer.write(HEADER.pack(SNAPSHOT, len(message)) + message)
+					await writer.drain()
+
+				else:
+					raise Exception("Unknown frame type {}".format(frame_type))
+
+		except ConnectionError:
+			pass
+		except Exception as error:
+			message = str(error).encode()
+			writer.write(HEADER.pack(ERROR, len(message)) + message)
+		finally:
+			self.connections -= 1
+			writer.close()
+
+
+async def serve(trace_server, server_args):
+	consumer = asyncio.create_task(trace_server.consume())
+
+	if server_args.unix != None:
+		server = await asyncio.start_unix_server(trace_server.handle, path = server_args.unix)
+		print("Listening on {}".format(server_args.unix))
+	else:
+		server = await asyncio.start_server(trace_server.handle, "127.0.0.1", server_args.port)
+		print("Listening on 127.0.0.1:{}".format(server_args.port))
+
+	try:
+		async with server:
+			await server.serve_forever()
+	finally:
+		consumer.cancel()
+
+
+async def connect(server_args):
+	if server_args.unix != None:
+		return await asyncio.open_unix_connection(server_args.unix)
+	return await asyncio.open_connection("127.0.0.1", server_args.port)
+
+
+async def request_snapshot(reader, writer):
+	writer.write(HEADER.pack(SNAPSHOT, 0))
+	await writer.drain()
+
+	frame = await read_frame(reader)
+	if frame == None:
+		raise Exception("Server closed the connection")
+	frame_type, payload = frame
+	if frame_type == ERROR:
+		raise Exception("Server error: {}".format(payload.decode()))
+	return json.loads(payload)
+
+
+async def replay(server_args):
+	#Client: stream a built-in kernel's trace in batches, then print a snapshot
+	reader, writer = await connect(server_args)
+
+	if server_args.replay != None:
+		addresses, writes, ops = FastCache.build_trace(server_args.replay, CacheEmulator.WORKLOAD_PARAMS[server_args.replay])
+		for start in range(0, len(addresses), server_args.batch):
+			writer.write(encode(addresses[start:start + server_args.batch], writes[start:start + server_args.batch]))
+			await writer.drain()
+
+	print(json.dumps(await request_snapshot(reader, writer), indent = 1))
+	writer.close()
+
+
+parser = argparse.ArgumentParser(description='Trace Ingest Server')
+parser.add_argument("--unix",help = "Unix socket path (default: TCP on 127.0.0.1)", default = None)
+parser.add_argument("--port",help = "TCP port on 127.0.0.1", default = 7878, type = int)
+parser.add_argument("-c","--cache-size",help = "Cache sizes in bytes to simulate", default = [65536], nargs = "+", type = int)
+parser.add_argument("-b","--block-size",help = "Block sizes in bytes", default = [64], nargs = "+", type = int)
+parser.add_argument("-n","--associativity",help = "Associativities", default = [2], nargs = "+", type = int)
+parser.add_argument("-r","--replacement",help = "Replacement policies", default = ["LRU"], nargs = "+", choices=['LRU', 'FIFO', 'random'])
+parser.add_argument("--queue-size",help = "Record batches buffered before producers are held back", default = 64, type = int)
+parser.add_argument("--max-frame",help = "Largest accepted frame payload in bytes", default = 1 << 24, type = int)
+parser.add_argument("--replay",help = "Client mode: stream this kernel's trace to a running server", default = None, choices=['dot', 'mxm', 'mxm_block'])
+parser.add_argument("--snapshot",help = "Client mode: print a running server's counters", action = "store_true")
+parser.add_argument("--batch",help = "Records per frame when replaying", default = 65536, type = int)
+
+
+if __name__ == "__main__":
+
+	server_args = parser.parse_args()
+
+	if server_args.replay != None or server_args.snapshot:
+		asyncio.run(replay(server_args))
+
+	else:
+		confs = [Configuration(cache_size, block_size, associativity, replacement, "trace")
+			for cache_size, block_size, associativity, replacement in itertools.product(server_args.cache_size,
+				server_args.block_size, server_args.associativity, server_args.replacement)]
+		trace_server = TraceServer(confs, server_args.queue_size, server_args.max_frame)
+
+		try:
+			asyncio.run(serve(trace_server, server_args))
+		except KeyboardInterrupt:
+			print(json.dumps(trace_server.snapshot(), indent = 1))
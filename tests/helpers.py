@@ -0,0 +1,44 @@
+import numpy as np
+
+import CacheEmulator
+import FastCache
+
+#RAM blocks for test runs; the 64MB default takes seconds to build and the small kernels need far less
+RAM_BLOCKS = 1 << 14
+
+COUNTERS = ["instruction_cnt", "read_hits", "read_misses", "write_hits", "write_misses"]
+
+
+def configure(argv, load = None, save = None, ram = False):
+	#Set CacheEmulator's globals the way main() does, minus timer and profiling
+	args = CacheEmulator.parser.parse_args(argv)
+	conf = CacheEmulator.configuration_from_args(args)
+	conf.blocks_in_RAM = min(conf.blocks_in_RAM, RAM_BLOCKS)
+
+	CacheEmulator.conf = conf
+	CacheEmulator.logging = CacheEmulator.Logging()
+	if conf.timing:
+		CacheEmulator.logging.register("cycles")
+	CacheEmulator.timer = None
+	CacheEmulator.checkpoint = {"load": load, "save": save, "ram": ram} if load != None or save != None else None
+	CacheEmulator.profile = None
+
+	np.random.seed(0)
+	return conf
+
+
+def run_python(argv, load = None, save = None, ram = False, **params):
+	#Run the reference kernel named by -a with the given size parameters; returns the Logging
+	conf = configure(argv, load, save, ram)
+	getattr(CacheEmulator, conf.algorithm)(**params)
+	return CacheEmulator.logging
+
+
+def run_fast(argv, load = None, save = None, **params):
+	conf = configure(argv, load, save)
+	FastCache.simulate(conf, CacheEmulator.logging, CacheEmulator.Timer(), params, CacheEmulator.begin_simulation, CacheEmulator.end_simulation)
+	return CacheEmulator.logging
+
+
+def counters(log):
+	return [getattr(log, counter) for counter in COUNTERS]
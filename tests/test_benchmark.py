@@ -0,0 +1,22 @@
+import CacheBenchmark
+
+
+def result(accesses_per_second, read_misses = 10):
+	return {"algorithm": "dot", "engine": "fast", "cache_size": 1024, "block_size": 64, "associativity": 2, "replacement": "LRU",
+		"instruction_cnt": 100, "read_hits": 90, "read_misses": read_misses, "write_hits": 0, "write_misses": 1,
+		"accesses_per_second": accesses_per_second, "peak_rss_kb": 1000}
+
+
+def test_compare_prints_na_without_throughput(capsys):
+	for old_rate, new_rate in [(None, 2e6), (1e6, None), (0.0, 2e6)]:
+		old = {"label": "old", "timestamp": "then", "results": [result(old_rate)]}
+		CacheBenchmark.compare(old, {"results": [result(new_rate, read_misses = 11)]})
+		printed = capsys.readouterr().out
+		assert "speedup:n/a" in printed and "counters:CHANGED" in printed
+
+
+def test_compare_prints_speedup(capsys):
+	old = {"label": "old", "timestamp": "then", "results": [result(1e6)]}
+	CacheBenchmark.compare(old, {"results": [result(2e6)]})
+	printed = capsys.readouterr().out
+	assert "speedup:2.00x" in printed and "counters:same" in printed
@@ -0,0 +1,124 @@
+from helpers import configure, counters, run_fast, run_python
+
+MXM_BLOCK = dict(x = 20, y = 20, z = 20, mxm_block_size = 5)
+
+
+def test_restore_continues_where_save_stopped(tmp_path):
+	#A second pass from the saved state hits on what the first pass left behind, the same way every time
+	path = str(tmp_path / "warm.npz")
+	argv = ["-c=4096", "-n=4"]
+
+	run_python(argv + ["-a=mxm_block"], save = path, **MXM_BLOCK)
+	warm = counters(run_python(argv + ["-a=mxm_block"], load = path, **MXM_BLOCK))
+	cold = counters(run_python(argv + ["-a=mxm_block"], **MXM_BLOCK))
+
+	assert warm[2] < cold[2]
+	assert warm == counters(run_python(argv + ["-a=mxm_block"], load = path, **MXM_BLOCK))
+
+
+def test_random_checkpoint_branches_on_either_engine(tmp_path):
+	#FastCache draws random victims ahead of use; both engines must continue from the same undrawn ones
+	for save_engine in [run_fast, run_python]:
+		path = str(tmp_path / "random.npz")
+		argv = ["-c=1024", "-n=4", "-r=random", "-a=mxm_block"]
+
+		save_engine(argv, save = path, **MXM_BLOCK)
+		fast = counters(run_fast(argv, load = path, **MXM_BLOCK))
+		python = counters(run_python(argv, load = path, **MXM_BLOCK))
+		assert fast == python
+
+
+def test_sector_valid_bits_survive_a_checkpoint(tmp_path):
+	import CacheCheckpoint
+	import CacheEmulator
+	from CacheEmulator import Address, Cache
+
+	path = str(tmp_path / "sectored.npz")
+	configure(["-c=1024", "-a=dot", "--sector-size=16"])
+	CacheEmulator.logging.register(*CacheEmulator.WIDE_COUNTERS)
+
+	#Only the first sector of each line is fetched
+	cache = Cache()
+	for line in range(4):
+		cache.getBytes(Address(line * 64), 8)
+	CacheCheckpoint.save(path, cache)
+
+	restored = Cache()
+	CacheCheckpoint.restore(path, restored)
+	assert [list(way) for ways in restored.sector_valid for way in ways] == [list(way) for ways in cache.sector_valid for way in ways]
+
+	#The second sector of a restored line is still a sector miss
+	CacheEmulator.logging.on()
+	restored.getBytes(Address(16), 8)
+	restored.getBytes(Address(0), 8)
+	assert (CacheEmulator.logging.sector_misses, CacheEmulator.logging.read_hits, CacheEmulator.logging.bytes_from_ram) == (1, 1, 16)
+
+
+def test_checkpoint_must_match_sector_size(tmp_path):
+	import pytest
+
+	path = str(tmp_path / "unsectored.npz")
+	run_python(["-c=1024", "-a=dot"], save = path, n = 100)
+	with pytest.raises(Exception):
+		run_python(["-c=1024", "-a=dot", "--sector-size=16"], load = path, n = 100)
+
+
+def test_tlb_contents_survive_a_checkpoint(tmp_path):
+	import pytest
+
+	path = str(tmp_path / "vm.npz")
+	argv = ["-c=65536", "-a=mxm_block", "--page-size=4K"]
+
+	cold = run_python(argv, save = path, **MXM_BLOCK)
+	assert cold.page_walks > 0
+	warm = run_python(argv, load = path, **MXM_BLOCK)
+	assert (warm.page_walks, warm.tlb1_misses, warm.read_misses) == (0, 0, 0)
+
+	#A checkpoint without TLBs would pair a warm cache with cold TLBs
+	plain = str(tmp_path / "plain.npz")
+	run_python(["-c=65536", "-a=mxm_block"], save = plain, **MXM_BLOCK)
+	with pytest.raises(Exception):
+		run_python(argv, load = plain, **MXM_BLOCK)
+
+
+def test_partition_state_survives_a_checkpoint(tmp_path):
+	import CacheCheckpoint
+	import CacheEmulator
+	from CacheEmulator import Address, Cache
+
+	path = str(tmp_path / "tenants.npz")
+	configure(["-c=1024", "-n=4", "-a=dot", "--tenants=2", "--partitioner=ucp", "--repartition-interval=50", "--umon-sets=4"])
+	CacheEmulator.logging.on()
+
+	cache = Cache()
+	for n in range(400):
+		cache.partition.tenant = n % 2
+		cache.getDouble(Address((n % 2) * 4096 + (n // 2 % (40 if n % 2 else 200)) * 8))
+	CacheCheckpoint.save(path, cache)
+
+	restored = Cache()
+	CacheCheckpoint.restore(path, restored)
+	assert restored.partition.owner == cache.partition.owner
+	assert restored.partition.masks == cache.partition.masks
+	assert restored.partition.accesses == cache.partition.accesses
+	for umon, saved in zip(restored.partition.umons, cache.partition.umons):
+		assert (umon.stacks, umon.hits) == (saved.stacks, saved.hits)
+
+
+def test_ram_checkpoint_loads_into_accumulating_kernels(tmp_path):
+	#C already holds C0 + A*B when saved; the loaded run adds A*B again and verifies against the restored C
+	import numpy as np
+
+	n = 10
+	c = slice(2 * n * n, 3 * n * n)
+	c0 = np.arange(n * n)
+	ab = np.arange(n * n).reshape(n, n) @ np.arange(n * n).reshape(n, n)
+	for algorithm, params in [("mxm", dict(x = n, y = n, z = n)), ("mxm_block", dict(x = n, y = n, z = n, mxm_block_size = 5))]:
+		once, twice = str(tmp_path / "once.npz"), str(tmp_path / "twice.npz")
+		argv = ["-c=1024", "-a={}".format(algorithm)]
+
+		run_python(argv, save = once, ram = True, **params)
+		run_python(argv, load = once, save = twice, ram = True, **params)
+
+		assert (np.load(once)["ram"].reshape(-1)[c] == c0 + ab.reshape(-1)).all()
+		assert (np.load(twice)["ram"].reshape(-1)[c] == c0 + 2 * ab.reshape(-1)).all()
@@ -0,0 +1,30 @@
+import pytest
+
+from helpers import counters, run_fast, run_python
+
+# cache_size, block_size, associativity
+GEOMETRIES = [(256, 64, 2), (1024, 8, 1), (1024, 64, 4), (1024, 256, 2), (2048, 64, 8)]
+
+#Small problem sizes that still overflow every geometry above
+WORKLOADS = [
+	("dot", {"n": 2000}),
+	("mxm", {"x": 12, "y": 10, "z": 14}),
+	("mxm_block", {"x": 20, "y": 20, "z": 20, "mxm_block_size": 5}),
+]
+
+
+@pytest.mark.parametrize("replacement", ["LRU", "FIFO", "random"])
+@pytest.mark.parametrize("cache_size,block_size,associativity", GEOMETRIES)
+@pytest.mark.parametrize("algorithm,params", WORKLOADS, ids = [name for name, params in WORKLOADS])
+def test_fast_engine_matches_reference(algorithm, params, cache_size, block_size, associativity, replacement):
+	argv = ["-c={}".format(cache_size), "-b={}".format(block_size), "-n={}".format(associativity), "-r={}".format(replacement), "-a={}".format(algorithm)]
+	assert counters(run_fast(argv, **params)) == counters(run_python(argv, **params))
+
+
+@pytest.mark.parametrize("loop_order", ["ijk", "ikj", "jik", "jki", "kij", "kji"])
+@pytest.mark.parametrize("replacement", ["LRU", "random"])
+def test_rectangular_tiles_match_reference(loop_order, replacement):
+	#Tile sizes that do not divide the matrix leave cut edge tiles
+	argv = ["-c=1024", "-n=2", "-r={}".format(replacement), "-a=mxm_block"]
+	params = {"x": 20, "y": 18, "z": 22, "tile": (7, 5, 9), "loop_order": loop_order}
+	assert counters(run_fast(argv, **params)) == counters(run_python(argv, **params))
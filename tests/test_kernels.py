@@ -0,0 +1,19 @@
+import CacheEmulator
+from helpers import counters, run_python
+
+
+def test_kernels_run_without_main():
+	#conf and logging set by hand, no timer or checkpoint globals
+	log = run_python(["-c=1024", "-a=dot"], n = 1000)
+	assert counters(log) == [4001, 1750, 250, 0, 1]
+
+	log = run_python(["-c=1024", "-a=mxm"], x = 10, y = 10, z = 10)
+	assert log.instruction_cnt == 10 * 10 * (4 * 10 + 2)
+
+	log = run_python(["-c=1024", "-a=mxm_block"], x = 20, y = 20, z = 20, mxm_block_size = 5)
+	assert log.read_hits + log.read_misses == 20 * 20 * (2 * 20 + 4)
+
+	log = run_python(["-c=1024", "-a=dot_vector", "--vector-width=32"], n = 64)
+	assert log.read_hits + log.read_misses == 2 * 64 // 4
+
+	assert CacheEmulator.timer == None
@@ -0,0 +1,12 @@
+from helpers import counters, run_python
+
+
+def test_mshrs_change_time_not_counts():
+	blocking = run_python(["-c=1024", "-a=dot"], n = 2000)
+	one = run_python(["-c=1024", "-a=dot", "--mshrs=1"], n = 2000)
+	eight = run_python(["-c=1024", "-a=dot", "--mshrs=8"], n = 2000)
+
+	assert counters(one) == counters(eight) == counters(blocking)
+	assert eight.cycles < one.cycles
+	assert one.peak_outstanding == 1 and 1 < eight.peak_outstanding <= 8
+	assert eight.mshr_allocations + eight.mshr_merges >= eight.read_misses + eight.write_misses
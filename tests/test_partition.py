@@ -0,0 +1,42 @@
+import CacheEmulator
+from CacheEmulator import Address, Cache
+from helpers import configure, counters, run_python
+
+
+def fill(cache, accesses = 400):
+	#Tenant 0 streams through 8KB, tenant 1 loops over 320 bytes
+	for n in range(accesses):
+		cache.partition.tenant = n % 2
+		cache.getDouble(Address((n % 2) * 65536 + (n // 2 % (40 if n % 2 else 1024)) * 8))
+
+
+def test_fills_stay_inside_the_way_mask():
+	configure(["-c=1024", "-n=4", "-a=dot", "--tenants=2", "--way-masks=0x3,0xc"])
+	CacheEmulator.logging.on()
+	cache = Cache()
+	fill(cache)
+
+	for ways in cache.partition.owner:
+		assert all(owner in (None, 0) for owner in ways[:2])
+		assert all(owner in (None, 1) for owner in ways[2:])
+	log = CacheEmulator.logging
+	assert (log.tenant0_cross_evictions, log.tenant1_cross_evictions) == (0, 0)
+	assert (log.tenant0_ways, log.tenant1_ways) == (2, 2)
+
+
+def test_utility_partitioning_keeps_every_way_assigned():
+	configure(["-c=1024", "-n=4", "-a=dot", "--tenants=2", "--partitioner=ucp", "--repartition-interval=50", "--umon-sets=4"])
+	CacheEmulator.logging.on()
+	cache = Cache()
+	fill(cache, 2000)
+
+	masks = cache.partition.masks
+	assert CacheEmulator.logging.repartitions > 0
+	assert masks[0] & masks[1] == 0 and masks[0] | masks[1] == 0xf
+	assert all(mask != 0 for mask in masks)
+
+
+def test_shared_ways_match_a_single_tenant_run():
+	single = run_python(["-c=1024", "-a=mxm"], x = 20, y = 20, z = 20)
+	shared = run_python(["-c=1024", "-a=mxm", "--tenants=2"], x = 20, y = 20, z = 20)
+	assert counters(shared) == counters(single)
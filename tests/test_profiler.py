@@ -0,0 +1,27 @@
+import cProfile
+import pstats
+
+import CacheEmulator
+import CacheProfiler
+from helpers import configure
+
+
+def test_profiled_run_reports_phases_and_accesses(tmp_path, capsys):
+	configure(["-c=1024", "-a=dot", "--profiler=cprofile"])
+	CacheEmulator.timer = CacheEmulator.Timer()
+	CacheEmulator.timer.profiler = cProfile.Profile()
+	CacheEmulator.profile = CacheEmulator.AccessProfile()
+	CacheEmulator.dot(n = 500)
+
+	log = CacheEmulator.logging
+	profile = CacheEmulator.profile
+	#Every access is looked up once; only misses fill
+	assert profile.counts["lookup"] == log.read_hits + log.read_misses + log.write_hits + log.write_misses
+	assert profile.counts["fill"] == log.read_misses + log.write_misses
+
+	output = str(tmp_path / "dot.prof")
+	CacheProfiler.report(CacheEmulator.timer, profile, log, output)
+	printed = capsys.readouterr().out
+	for heading in ["Phase Times:", "\tsimulate:", "Time Per Access", "Simulate Phase Profile:"]:
+		assert heading in printed
+	assert pstats.Stats(output).total_calls > 0
@@ -0,0 +1,56 @@
+import os
+
+import CacheEmulator
+import helpers
+from ResultCache import ResultCache, cached_main
+
+
+def fast_args(*argv):
+	#1MB holds all of dot, so a warm start has no misses
+	return CacheEmulator.parser.parse_args(["-c=1048576", "-a=dot", "-e=fast"] + list(argv))
+
+
+def test_repeated_configuration_is_a_hit(tmp_path):
+	cache = ResultCache(str(tmp_path / "store"))
+	first = helpers.counters(cached_main(fast_args(), cache))
+	second = helpers.counters(cached_main(fast_args(), cache))
+	assert first == second
+	assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_checkpoint_runs_bypass_the_cache(tmp_path):
+	cache = ResultCache(str(tmp_path / "store"))
+	cold = helpers.counters(cached_main(fast_args(), cache))
+
+	#Saving must write the checkpoint even though the configuration is stored
+	path = str(tmp_path / "warm.npz")
+	cached_main(fast_args("--save-state", path), cache)
+	assert os.path.exists(path)
+
+	#A warm start must not be served the cold counters
+	warm = helpers.counters(cached_main(fast_args("--load-state", path), cache))
+	assert warm != cold
+	assert cache.hits == 0
+
+
+def test_profiled_runs_bypass_the_cache(tmp_path, capsys):
+	cache = ResultCache(str(tmp_path / "store"))
+	cached_main(fast_args(), cache)
+	capsys.readouterr()
+
+	cached_main(fast_args("--profile"), cache)
+	assert "Phase Times:" in capsys.readouterr().out
+	assert cache.hits == 0
+
+
+def test_results_are_recorded_on_hits_and_misses(tmp_path):
+	import ResultTable
+
+	cache = ResultCache(str(tmp_path / "store"))
+	results = str(tmp_path / "runs.csv")
+	cached_main(fast_args("--results", results), cache)
+	cached_main(fast_args("--results", results), cache)
+
+	columns = ResultTable.load(results)
+	assert len(columns["read_misses"]) == 2
+	assert columns["read_misses"][0] == columns["read_misses"][1]
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import CacheEmulator
+import ResultTable
+from helpers import configure, run_fast
+
+
+def sweep_rows():
+	#A default run and a TLB run of the same cache, as a sweep file can hold both
+	log = run_fast(["-c=1024", "-a=dot"], n = 200)
+	default = ResultTable.record(CacheEmulator.conf, log, "fast")
+	configure(["-c=1024", "-a=dot", "--page-size=4K"])
+	tlb = ResultTable.record(CacheEmulator.conf, CacheEmulator.logging, "fast")
+	return default, tlb
+
+
+@pytest.mark.parametrize("name", ["runs.csv", "runs.parquet"])
+def test_append_and_select_full_configuration(tmp_path, name):
+	if name.endswith(".parquet"):
+		pytest.importorskip("pyarrow")
+	path = str(tmp_path / name)
+
+	default, tlb = sweep_rows()
+	ResultTable.append(path, default)
+	ResultTable.append(path, tlb)
+
+	columns = ResultTable.load(path)
+	assert len(columns["cache_size"]) == 2
+
+	#Selecting by the whole default configuration must skip the TLB run appended after it
+	conf = configure(["-c=1024", "-a=dot"])
+	row = ResultTable.latest(columns, version = CacheEmulator.SIMULATOR_VERSION, engine = "fast", **ResultTable.fields(conf))
+	assert row != None
+	assert row["read_misses"] == default["read_misses"]
+
+	assert ResultTable.latest(columns, version = "0", **ResultTable.fields(conf)) == None
+
+
+def test_parquet_append_writes_only_new_rows(tmp_path):
+	pytest.importorskip("pyarrow")
+	path = str(tmp_path / "runs.parquet")
+
+	default, tlb = sweep_rows()
+	for run in range(3):
+		ResultTable.append(path, default)
+
+	#One part per append; earlier parts are never rewritten
+	assert len(os.listdir(path)) == 3
+	assert len(ResultTable.load(path)["read_hits"]) == 3
+
+
+def test_unknown_format_is_rejected(tmp_path):
+	with pytest.raises(Exception):
+		ResultTable.append(str(tmp_path / "runs.npz"), sweep_rows()[0])
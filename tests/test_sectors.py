@@ -0,0 +1,66 @@
+from helpers import counters, run_python
+
+
+def test_sector_misses_fill_their_sectors():
+	log = run_python(["-c=1024", "-a=mxm", "--sector-size=16"], x = 20, y = 20, z = 20)
+	assert counters(log) == [32800, 6448, 9952, 0, 400]
+	assert log.sector_misses == 2782
+	assert log.bytes_from_ram == 165632
+
+
+def test_streaming_reads_every_byte_once():
+	#Each of the 2n doubles comes from RAM once, plus one 16 byte sector for the result
+	n = 512
+	log = run_python(["-c=1024", "-a=dot_vector", "--sector-size=16"], n = n)
+	assert log.read_misses == 2 * n // 4
+	assert log.sector_misses == n // 4
+	assert log.bytes_from_ram == 2 * n * 8 + 16
+
+
+def test_unaligned_sectored_loads():
+	log = run_python(["-c=256", "-b=64", "-n=2", "-a=dot_vector", "--vector-width=24", "--offset=4", "--sector-size=8"], n = 480)
+	assert counters(log) == [641, 40, 400, 0, 1]
+	assert (log.unaligned_accesses, log.split_accesses, log.sector_misses, log.bytes_from_ram) == (321, 120, 279, 7704)
+
+
+def test_one_sector_per_block_matches_unsectored():
+	unsectored = run_python(["-c=1024", "-a=mxm"], x = 20, y = 20, z = 20)
+	sectored = run_python(["-c=1024", "-a=mxm", "--sector-size=64"], x = 20, y = 20, z = 20)
+	assert counters(sectored) == counters(unsectored)
+	assert sectored.sector_misses == 0
+
+
+def test_sectored_counts_do_not_depend_on_tenancy():
+	#Tenants sharing every way must see the same sector fills as a single-tenant run
+	single = run_python(["-c=1024", "-a=mxm", "--sector-size=16"], x = 20, y = 20, z = 20)
+	shared = run_python(["-c=1024", "-a=mxm", "--sector-size=16", "--tenants=2"], x = 20, y = 20, z = 20)
+	assert counters(shared) == counters(single)
+	assert (shared.sector_misses, shared.bytes_from_ram) == (single.sector_misses, single.bytes_from_ram)
+	assert shared.tenant0_hits + shared.tenant0_misses == single.read_hits + single.read_misses + single.write_hits + single.write_misses
+
+
+def test_page_crossing_load_translates_both_pages():
+	import CacheEmulator
+	from CacheEmulator import Address, CPU
+	from helpers import configure
+
+	configure(["-c=1024", "-a=dot_vector", "--page-size=4096", "--sector-size=16"])
+	CacheEmulator.logging.on()
+	cpu = CPU()
+	cpu.load(Address(4096 - 8), 16)
+	log = CacheEmulator.logging
+	assert log.tlb1_hits + log.tlb1_misses == 2
+	assert log.page_walks == 2
+
+
+def test_profiling_times_sectored_lookups():
+	import CacheEmulator
+	from helpers import configure
+
+	configure(["-c=1024", "-a=dot_vector", "--sector-size=16"])
+	CacheEmulator.profile = CacheEmulator.AccessProfile()
+	CacheEmulator.dot_vector(n = 512)
+	log = CacheEmulator.logging
+	#One lookup per line accessed; the way search after a fill is not counted
+	assert CacheEmulator.profile.counts["lookup"] == log.read_hits + log.read_misses + log.write_hits + log.write_misses
+	assert CacheEmulator.profile.counts["fill"] == log.read_misses + log.write_misses - log.sector_misses
@@ -0,0 +1,17 @@
+import TileTuner
+from CacheEmulator import Configuration
+
+
+def test_tuned_tiling_is_no_worse_than_the_default():
+	conf = Configuration(1024, 64, 2, "LRU", "mxm_block")
+	tuner = TileTuner.TileTuner(conf, (16, 16, 16))
+	score, tile, loop_order = tuner.tune()
+	assert score <= tuner.baseline
+	#The winner's score is what a fresh, unbounded run of it gives
+	assert TileTuner.TileTuner(conf, (16, 16, 16)).run(tile, loop_order) == score
+	#Clamped and reordered candidates collapse onto ones already simulated
+	assert tuner.duplicates > 0
+
+
+def test_tile_sizes_include_divisors_and_the_extent():
+	assert TileTuner.tile_sizes(12) == [2, 3, 4, 6, 8, 12]
@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import FastCache
+import TraceServer
+from CacheEmulator import Configuration
+
+
+def test_records_round_trip():
+	addresses = np.array([0, 8, 1 << 40], dtype=np.int64)
+	writes = np.array([False, True, False])
+	frame = TraceServer.encode(addresses, writes)
+	frame_type, length = TraceServer.HEADER.unpack(frame[:TraceServer.HEADER.size])
+	assert (frame_type, length) == (TraceServer.RECORDS, 3 * 9)
+
+	decoded_addresses, decoded_writes = TraceServer.decode(frame[TraceServer.HEADER.size:])
+	assert decoded_addresses.tolist() == addresses.tolist()
+	assert decoded_writes.tolist() == writes.tolist()
+
+
+def test_bad_records_are_rejected():
+	with pytest.raises(Exception):
+		TraceServer.decode(b"\0" * 10)
+	with pytest.raises(Exception):
+		TraceServer.decode(TraceServer.encode([0], [2])[TraceServer.HEADER.size:])
+
+
+def test_streamed_trace_matches_a_direct_run(tmp_path):
+	conf = Configuration(1024, 64, 2, "LRU", "trace")
+	addresses = np.arange(0, 1 << 16, 8, dtype=np.int64) % 4096
+	writes = addresses % 128 == 0
+
+	direct = FastCache.FastCache(conf)
+	direct.access(addresses, writes)
+
+	async def stream():
+		trace_server = TraceServer.TraceServer([conf])
+		consumer = asyncio.create_task(trace_server.consume())
+		path = str(tmp_path / "trace.sock")
+		server = await asyncio.start_unix_server(trace_server.handle, path = path)
+		try:
+			reader, writer = await asyncio.open_unix_connection(path)
+			for start in range(0, len(addresses), 1000):
+				writer.write(TraceServer.encode(addresses[start:start + 1000], writes[start:start + 1000]))
+			snapshot = await TraceServer.request_snapshot(reader, writer)
+			writer.close()
+			return snapshot
+		finally:
+			server.close()
+			consumer.cancel()
+
+	snapshot = asyncio.run(stream())
+	assert snapshot["records"] == len(addresses)
+	streamed = snapshot["configurations"][0]
+	for counter, slot in TraceServer.COUNTERS:
+		assert streamed[counter] == int(direct.counters[slot])